@@ -0,0 +1,86 @@
+# benchmarks/bench_day_bucketing.py
+# Comparaison du regroupement par jour : parsing de dt_txt (strptime/strftime) contre timestamp epoch list.dt
+import time
+from datetime import datetime
+
+import click
+
+from common import make_payload
+import weather_report
+
+# Ancien chemin : parsing de dt_txt puis formatage de la date pour chaque entrée
+def legacy_day_key(entry):
+    timestamp = datetime.strptime(entry["dt_txt"], weather_report.DATETIME_FORMAT)
+    return timestamp.strftime(weather_report.DATE_FORMAT)
+
+# Ancien formatage complet (avant list.dt) : clé de jour par dt_txt, entrées stockées par jour puis transitions
+def legacy_format_forecast(data):
+    city_info = data["city"]
+    result = {
+        "forecast_location_name": city_info["name"],
+        "country_code": city_info["country"],
+        "total_rain_period_mm": 0.0,
+        "total_snow_period_mm": 0.0,
+        "max_humidity_period": 0,
+        "forecast_details": [],
+    }
+    days = {}
+
+    for entry in data["list"]:
+        date_str = legacy_day_key(entry)
+        rain = entry["rain"].get("3h", 0.0) if "rain" in entry else 0.0
+        snow = entry["snow"].get("3h", 0.0) if "snow" in entry else 0.0
+        humidity = entry["main"]["humidity"]
+
+        result["total_rain_period_mm"] += rain
+        result["total_snow_period_mm"] += snow
+        if humidity > result["max_humidity_period"]:
+            result["max_humidity_period"] = humidity
+
+        day = days.setdefault(date_str, {"rain_cumul_mm": 0.0, "snow_cumul_mm": 0.0, "entries": []})
+        day["rain_cumul_mm"] += rain
+        day["snow_cumul_mm"] += snow
+        day["entries"].append({"temp": entry["main"]["temp"], "weather": entry["weather"][0]["main"]})
+
+    for date_str, day in days.items():
+        result["forecast_details"].append({
+            "date_local": date_str,
+            "rain_cumul_mm": round(day["rain_cumul_mm"], 2),
+            "snow_cumul_mm": round(day["snow_cumul_mm"], 2),
+            "major_transitions_count": weather_report.calcul_major_transitions(day["entries"]),
+        })
+
+    return result
+
+# Nouveau chemin : numéro de jour local via list.dt + city.timezone, date formatée une fois par jour
+def epoch_day_key(entry, tz_offset):
+    return weather_report.day_number_to_date((entry["dt"] + tz_offset) // weather_report.SECONDS_PER_DAY)
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+@click.command()
+@click.option('--payloads', '-n', default=2000, show_default=True, help='Nombre de JSON synthétiques')
+@click.option('--repeat', '-r', default=5, show_default=True, help='Nombre de répétitions (meilleur temps retenu)')
+def main(payloads, repeat):
+    data = [make_payload(seed) for seed in range(payloads)]
+    entries = [(entry, d["city"]["timezone"]) for d in data for entry in d["list"]]
+
+    legacy = best_of(repeat, lambda: [legacy_day_key(entry) for entry, _ in entries])
+    epoch = best_of(repeat, lambda: [epoch_day_key(entry, tz) for entry, tz in entries])
+    # Formatage complet : ancien formateur (dt_txt, de bout en bout) contre format_forecast actuel
+    format_dt_txt = best_of(repeat, lambda: [legacy_format_forecast(d) for d in data])
+    format_epoch = best_of(repeat, lambda: [weather_report.format_forecast(d) for d in data])
+
+    click.echo(f"{payloads} JSON, {len(entries)} entrées 3h (meilleur de {repeat})\n")
+    click.echo(f"{'Étape':<40}{'dt_txt (s)':>12}{'epoch (s)':>12}{'gain':>8}")
+    click.echo(f"{'Clé de jour par entrée':<40}{legacy:>12.4f}{epoch:>12.4f}{legacy / epoch:>7.1f}x")
+    click.echo(f"{'format_forecast complet':<40}{format_dt_txt:>12.4f}{format_epoch:>12.4f}{format_dt_txt / format_epoch:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
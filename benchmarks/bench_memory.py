@@ -0,0 +1,39 @@
+# benchmarks/bench_memory.py
+# Mémoire occupée par des prévisions gardées en mémoire : dicts formatés contre enregistrements compacts (__slots__)
+import time
+import tracemalloc
+
+import click
+
+from common import make_payload
+import forecast_core
+
+# Mémoire retenue (octets) et durée de construction d'une liste de résultats
+def measure(build, data):
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = [build(d) for d in data]
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return retained, elapsed
+
+@click.command()
+@click.option('--payloads', '-n', default=10000, show_default=True, help='Nombre de prévisions gardées en mémoire')
+def main(payloads):
+    # Identité de to_dict() avec l'ancien formateur : voir tests/test_forecast_core.py (sortie figée)
+    data = [make_payload(seed) for seed in range(payloads)]
+
+    scenarios = [
+        ("format_forecast (dicts)", forecast_core.format_forecast),
+        ("summarize_forecast (__slots__)", forecast_core.summarize_forecast),
+    ]
+    click.echo(f"{payloads} prévisions gardées en mémoire\n")
+    click.echo(f"{'Représentation':<34}{'total (Mo)':>12}{'octets/prévision':>18}{'durée (s)':>11}")
+    for name, build in scenarios:
+        retained, elapsed = measure(build, data)
+        click.echo(f"{name:<34}{retained / 1e6:>12.2f}{retained / payloads:>18.0f}{elapsed:>11.3f}")
+
+if __name__ == "__main__":
+    main()
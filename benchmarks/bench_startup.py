@@ -0,0 +1,51 @@
+# benchmarks/bench_startup.py
+# Mesure du temps de démarrage : import des modules et temps jusqu'au premier octet affiché par la CLI
+import sys
+import statistics
+import subprocess
+import tempfile
+import time
+
+import click
+
+from common import prepare_project, seed_cache
+
+# Lance une commande et mesure (temps jusqu'au premier octet sur stdout, temps total)
+def run_once(args, cwd):
+    start = time.perf_counter()
+    process = subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    first = process.stdout.read(1)
+    first_byte = time.perf_counter() - start
+    process.communicate()
+    total = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"Commande en échec ({process.returncode}) : {' '.join(args)}")
+    return (first_byte if first else total), total
+
+def measure(args, cwd, repeat):
+    runs = [run_once(args, cwd) for _ in range(repeat)]
+    return statistics.median(r[0] for r in runs), statistics.median(r[1] for r in runs)
+
+@click.command()
+@click.option('--repeat', '-r', default=10, show_default=True, help='Nombre de lancements par scénario (médiane retenue)')
+def main(repeat):
+    with tempfile.TemporaryDirectory() as directory:
+        prepare_project(directory)
+        seed_cache(directory, "Paris", "FR")
+        python = sys.executable
+        scenarios = [
+            ("Interpréteur seul", [python, "-c", "pass"]),
+            ("import forecast_core", [python, "-c", "import forecast_core"]),
+            ("import weather_report", [python, "-c", "import weather_report"]),
+            ("weather_report.py --help", [python, "weather_report.py", "--help"]),
+            ("Rapport en cache (Paris,FR)", [python, "weather_report.py", "-c", "Paris", "-co", "FR"]),
+        ]
+
+        click.echo(f"Médiane sur {repeat} lancements\n")
+        click.echo(f"{'Scénario':<32}{'1er octet (ms)':>16}{'total (ms)':>12}")
+        for name, args in scenarios:
+            first_byte, total = measure(args, directory, repeat)
+            click.echo(f"{name:<32}{first_byte * 1000:>16.1f}{total * 1000:>12.1f}")
+
+if __name__ == "__main__":
+    main()
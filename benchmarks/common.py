@@ -0,0 +1,105 @@
+# benchmarks/common.py
+# Outils partagés par les benchmarks : JSON synthétiques, copie du projet, percentiles
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import subprocess
+import zlib
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_FILES = ["weather_report.py", "forecast_core.py", "ascii_art.txt"]
+
+# Les benchmarks importent le projet depuis le dossier parent
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+WEATHER_CATEGORIES = ["Clear", "Clouds", "Rain", "Snow", "Drizzle", "Thunderstorm"]
+FORECAST_START = 1767225600  # 2026-01-01 00:00 UTC
+FORECAST_STEP = 10800  # Une entrée toutes les 3 heures
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Génération d'un JSON raw synthétique (même structure que /data/2.5/forecast)
+def make_payload(seed, entries=40, start=FORECAST_START, tz_offset=3600, city=None, country="FR"):
+    rng = random.Random(seed)
+    forecast_list = []
+    for i in range(entries):
+        dt = start + i * FORECAST_STEP
+        entry = {
+            "dt": dt,
+            "main": {
+                "temp": round(rng.uniform(-5, 30), 2),
+                "feels_like": round(rng.uniform(-8, 32), 2),
+                "pressure": rng.randint(990, 1035),
+                "humidity": rng.randint(30, 100),
+            },
+            "weather": [{"id": 800, "main": rng.choice(WEATHER_CATEGORIES), "description": "synthétique", "icon": "01d"}],
+            "clouds": {"all": rng.randint(0, 100)},
+            "wind": {"speed": round(rng.uniform(0, 15), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0, 25), 2)},
+            "visibility": 10000,
+            "pop": round(rng.random(), 2),
+            "sys": {"pod": "d"},
+            "dt_txt": time.strftime(DATETIME_FORMAT, time.gmtime(dt)),
+        }
+        if rng.random() < 0.4:
+            entry["rain"] = {"3h": round(rng.uniform(0, 5), 2)}
+        if rng.random() < 0.2:
+            entry["snow"] = {"3h": round(rng.uniform(0, 3), 2)}
+        forecast_list.append(entry)
+
+    return {
+        "cod": "200",
+        "message": 0,
+        "cnt": entries,
+        "list": forecast_list,
+        "city": {
+            "id": seed,
+            "name": city or f"City{seed}",
+            "coord": {"lat": round(rng.uniform(-60, 70), 4), "lon": round(rng.uniform(-180, 180), 4)},
+            "country": country,
+            "population": rng.randint(1000, 1000000),
+            "timezone": tz_offset,
+            "sunrise": start + 25000,
+            "sunset": start + 60000,
+        },
+    }
+
+# JSON synthétique stable pour une ville donnée (même ville -> même prévision)
+def payload_for_city(city, country):
+    return make_payload(zlib.crc32(f"{city}|{country}".encode("utf-8")), city=city, country=country)
+
+# Copie du projet dans un dossier temporaire, avec une clé API factice
+def prepare_project(directory, api_key="benchmark"):
+    for name in PROJECT_FILES:
+        shutil.copy(os.path.join(PROJECT_DIR, name), directory)
+    with open(os.path.join(directory, "local.conf"), "w") as f:
+        f.write(f"API_KEY={api_key}\n")
+
+# Pré-remplit le cache du projet copié pour (ville, pays)
+def seed_cache(directory, city, country):
+    script = (
+        "import json, sys, weather_report as w\n"
+        "w.write_cache_entry(w.cache_key(sys.argv[1], sys.argv[2]), json.loads(sys.stdin.read()))\n"
+    )
+    payload = json.dumps(payload_for_city(city, country)).encode("utf-8")
+    subprocess.run([sys.executable, "-c", script, city, country], cwd=directory, input=payload, check=True)
+
+# Percentiles (rang le plus proche) d'une liste de durées
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def summarize(durations, elapsed):
+    # Débit (opérations/s) et latences p50/p95/p99 en millisecondes
+    return {
+        "count": len(durations),
+        "throughput_per_s": len(durations) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p95_ms": percentile(durations, 95) * 1000,
+        "p99_ms": percentile(durations, 99) * 1000,
+    }
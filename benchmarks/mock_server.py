@@ -0,0 +1,163 @@
+# benchmarks/mock_server.py
+# Faux serveur OpenWeatherMap local (/data/2.5/forecast) pour les benchmarks hors ligne
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import click
+
+from common import payload_for_city
+
+FORECAST_PATH = "/data/2.5/forecast"
+INVALID_API_KEY = "invalid"
+DEFAULT_MOCK_HOST = "127.0.0.1"
+DEFAULT_MOCK_PORT = 8765
+
+class MockForecastServer:
+    """
+    Serveur HTTP local qui imite l'endpoint forecast d'OpenWeatherMap.
+
+    Chaque ville reçoit un JSON synthétique stable (graine dérivée du nom). La latence
+    (latency ± jitter, en secondes) et le taux d'erreur (500, ou 429 avec Retry-After)
+    sont configurables. La clé "invalid" renvoie 401. Port 0 : port libre choisi par l'OS.
+    """
+
+    def __init__(self, host=DEFAULT_MOCK_HOST, port=0, latency=0.0, jitter=0.0, error_rate=0.0, throttle_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._payloads = {}
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "unauthorized": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{FORECAST_PATH}"
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _draw(self):
+        # Tirage (délai, issue) sous verrou : random.Random n'est pas partagé sans risque
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return delay, "error"
+        if roll < self.error_rate + self.throttle_rate:
+            return delay, "throttled"
+        return delay, "ok"
+
+    def _payload(self, city, country):
+        # JSON sérialisé une seule fois par ville : seule la latence simulée compte
+        key = (city, country)
+        body = self._payloads.get(key)
+        if body is None:
+            body = json.dumps(payload_for_city(city, country)).encode("utf-8")
+            self._payloads[key] = body
+        return body
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path != FORECAST_PATH:
+                    self._send(404, b'{"cod":"404","message":"Not found"}')
+                    return
+
+                query = parse_qs(parts.query)
+                delay, outcome = server._draw()
+                if delay:
+                    time.sleep(delay)
+
+                if query.get("appid", [""])[0] == INVALID_API_KEY:
+                    server._count("unauthorized")
+                    self._send(401, b'{"cod":401,"message":"Invalid API key."}')
+                    return
+                if outcome == "error":
+                    server._count("errors")
+                    self._send(500, b'{"cod":"500","message":"Internal error"}')
+                    return
+                if outcome == "throttled":
+                    server._count("throttled")
+                    self._send(429, b'{"cod":429,"message":"Too many requests"}', {"Retry-After": "0"})
+                    return
+
+                # Lieu par nom (q=ville,pays), identifiant (id=) ou coordonnées (lat=, lon=)
+                if "id" in query:
+                    city, country = f"City{query['id'][0]}", "XX"
+                elif "lat" in query and "lon" in query:
+                    city, country = f"{query['lat'][0]},{query['lon'][0]}", "XX"
+                else:
+                    city, _, country = query.get("q", [""])[0].rpartition(",")
+                    if not city:
+                        city, country = country, ""
+                server._count("ok")
+                self._send(200, server._payload(city, country))
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+@click.command()
+@click.option('--host', default=DEFAULT_MOCK_HOST, show_default=True, help="Adresse d'écoute")
+@click.option('--port', '-p', default=DEFAULT_MOCK_PORT, show_default=True, help="Port d'écoute")
+@click.option('--latency', default=0.05, show_default=True, help='Latence simulée par requête (secondes)')
+@click.option('--jitter', default=0.02, show_default=True, help='Variation aléatoire de la latence (± secondes)')
+@click.option('--error-rate', default=0.0, show_default=True, help='Proportion de réponses 500')
+@click.option('--throttle-rate', default=0.0, show_default=True, help='Proportion de réponses 429 (avec Retry-After)')
+def main(host, port, latency, jitter, error_rate, throttle_rate):
+    server = MockForecastServer(host, port, latency, jitter, error_rate, throttle_rate)
+    click.echo(f"Faux serveur OpenWeatherMap sur {server.url} (Ctrl+C pour arrêter)")
+    click.echo(f"Utilisation : weather_report.py --api-url {server.url} ...")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        click.echo(f"Statistiques : {server.stats}")
+
+if __name__ == "__main__":
+    main()
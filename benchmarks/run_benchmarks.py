@@ -0,0 +1,138 @@
+# benchmarks/run_benchmarks.py
+# Suite de benchmarks hors ligne : formatage, CLI ville unique et batch contre le faux serveur local
+import json
+import os
+import sys
+import subprocess
+import tempfile
+import time
+
+import click
+
+from common import make_payload, prepare_project, summarize
+from mock_server import MockForecastServer
+import forecast_core
+
+DEFAULT_TOLERANCE = 0.2  # Régression acceptée : 20 % de débit en moins / de p95 en plus
+
+# Script exécuté dans la copie du projet : batch en processus, durée de chaque ville
+BATCH_SCRIPT = """
+import json, sys, time
+import weather_report as w
+
+api_url, workers, cities = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+w.configure_api_url(api_url)
+w.configure_rate_limit(calls_per_minute=0)
+w.configure_cache(enabled=False)
+w.configure_http_session(pool_maxsize=max(workers, w.HTTP_POOL_MAXSIZE))
+
+durations = []
+report = w.execute_weather_report
+def timed_report(*args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return report(*args, **kwargs)
+    finally:
+        durations.append(time.perf_counter() - start)
+w.execute_weather_report = timed_report
+
+pairs = [(f"City{i}", "FR") for i in range(cities)]
+start = time.perf_counter()
+with w.BatchOutputWriter() as writer:
+    results = w.execute_batch_report(pairs, "benchmark", workers=workers, use_cache=False, writer=writer)
+elapsed = time.perf_counter() - start
+json.dump({"durations": durations, "elapsed": elapsed, "failed": sum(1 for _, _, ok in results if not ok)}, sys.stdout)
+"""
+
+# Formatage seul (en processus) : format_forecast sur des JSON synthétiques
+def bench_format(count):
+    payloads = [make_payload(seed) for seed in range(count)]
+    durations = []
+    start = time.perf_counter()
+    for payload in payloads:
+        t0 = time.perf_counter()
+        forecast_core.format_forecast(payload)
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations, time.perf_counter() - start)
+
+# CLI ville unique : un processus par rapport (démarrage + requête + formatage + sauvegarde)
+def bench_single(directory, api_url, runs):
+    args = [sys.executable, "weather_report.py", "-c", "Paris", "-co", "FR", "--api-url", api_url,
+            "--no-cache", "--rate-limit", "0", "--no-display"]
+    durations = []
+    start = time.perf_counter()
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(args, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        durations.append(time.perf_counter() - t0)
+    return summarize(durations, time.perf_counter() - start)
+
+# Batch : execute_batch_report dans la copie du projet, écriture JSON Lines
+def bench_batch(directory, api_url, cities, workers):
+    output = subprocess.run([sys.executable, "-c", BATCH_SCRIPT, api_url, str(workers), str(cities)],
+                            cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    result = json.loads(output.stdout)
+    summary = summarize(result["durations"], result["elapsed"])
+    summary["failed"] = result["failed"]
+    return summary
+
+# Comparaison avec une référence : liste des régressions au-delà de la tolérance
+def compare_to_baseline(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference:
+            continue
+        if current["throughput_per_s"] < reference["throughput_per_s"] * (1 - tolerance):
+            regressions.append(f"{name} : débit {current['throughput_per_s']:.1f}/s < référence {reference['throughput_per_s']:.1f}/s")
+        if current["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name} : p95 {current['p95_ms']:.2f} ms > référence {reference['p95_ms']:.2f} ms")
+    return regressions
+
+@click.command()
+@click.option('--payloads', '-n', default=2000, show_default=True, help='Nombre de JSON pour le benchmark de formatage')
+@click.option('--runs', '-r', default=10, show_default=True, help='Nombre de lancements de la CLI ville unique')
+@click.option('--cities', default=200, show_default=True, help='Nombre de villes du batch')
+@click.option('--workers', '-w', default=8, show_default=True, help='Requêtes simultanées du batch')
+@click.option('--latency', default=0.02, show_default=True, help='Latence simulée par le faux serveur (secondes)')
+@click.option('--jitter', default=0.005, show_default=True, help='Variation de la latence simulée (± secondes)')
+@click.option('--error-rate', default=0.0, show_default=True, help='Proportion de réponses 500 (rejouées par les retries)')
+@click.option('--throttle-rate', default=0.0, show_default=True, help='Proportion de réponses 429')
+@click.option('--seed', default=0, show_default=True, help='Graine du faux serveur (latences et erreurs reproductibles)')
+@click.option('--json-output', type=click.Path(dir_okay=False), help='Écrire les résultats dans un fichier JSON')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Fichier JSON de référence (produit par --json-output)')
+@click.option('--tolerance', default=DEFAULT_TOLERANCE, show_default=True, help='Régression tolérée par rapport à la référence (0.2 = 20 %)')
+def main(payloads, runs, cities, workers, latency, jitter, error_rate, throttle_rate, seed, json_output, baseline, tolerance):
+    results = {}
+    with MockForecastServer(latency=latency, jitter=jitter, error_rate=error_rate, throttle_rate=throttle_rate, seed=seed) as server:
+        click.echo(f"Faux serveur : {server.url}")
+        results["format"] = bench_format(payloads)
+        with tempfile.TemporaryDirectory() as directory:
+            prepare_project(directory)
+            results["single_city_cli"] = bench_single(directory, server.url, runs)
+            results["batch"] = bench_batch(directory, server.url, cities, workers)
+        click.echo(f"Requêtes reçues par le faux serveur : {server.stats}")
+
+    click.echo(f"\n{'Scénario':<18}{'N':>7}{'débit/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        click.echo(f"{name:<18}{r['count']:>7}{r['throughput_per_s']:>12.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+    if results["batch"]["failed"]:
+        click.echo(f"\nAttention : {results['batch']['failed']} ville(s) en échec dans le batch.")
+
+    if json_output:
+        with open(json_output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        click.echo(f"\nRésultats sauvegardés dans le fichier : {json_output}")
+
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            regressions = compare_to_baseline(results, json.load(f), tolerance)
+        if regressions:
+            click.echo("\nRégressions détectées :", err=True)
+            for line in regressions:
+                click.echo(f"  {line}", err=True)
+            sys.exit(1)
+        click.echo(f"\nAucune régression au-delà de {tolerance:.0%} par rapport à {os.path.basename(baseline)}.")
+
+if __name__ == "__main__":
+    main()
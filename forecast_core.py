@@ -0,0 +1,527 @@
+# forecast_core.py
+# Fonctions pures de mise en forme des prévisions (aucune dépendance externe, aucun effet de bord à l'import)
+import functools
+import threading
+import time
+from datetime import date, timedelta
+from operator import itemgetter
+
+# Constantes pour les formats de date
+DATE_FORMAT = "%Y-%m-%d"  # Format pour les dates locales
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # Format pour les timestamps API
+SECONDS_PER_DAY = 86400
+EPOCH_DATE = date(1970, 1, 1)
+
+# Seuils par défaut des transitions majeures : list.weather.main change ET variation de température > 3°C
+TRANSITION_TEMP_DELTA = 3
+TRANSITION_REQUIRE_WEATHER_CHANGE = True
+
+# Calcul des transitions majeures basé sur list.weather.main
+def calcul_major_transitions(entries, temp_delta=TRANSITION_TEMP_DELTA, require_weather_change=TRANSITION_REQUIRE_WEATHER_CHANGE):
+    """
+    Calcule le nombre de transitions majeures dans une journée via entries.
+
+    La structure est la suivante:
+    [
+        {
+            "temp": 20.0,
+            "weather": "Rain"
+        },
+        {
+            "temp": 21.0,
+            "weather": "Snow"
+        }
+
+        etc....
+    ]
+
+    Sans require_weather_change, seule la variation de température (> temp_delta) compte.
+    """
+    major_transitions = 0
+
+    # On compare chaque entrée avec la précédente
+    for i in range(1, len(entries)):
+        prev = entries[i - 1]
+        curr = entries[i]
+
+        # Comparaison de list.weather.main entre deux échantillons consécutifs
+        weather_main_changed = (prev["weather"] != curr["weather"])
+        temp_change = abs(prev["temp"] - curr["temp"])
+
+        # Transition majeure si list.weather.main change ET variation temp > temp_delta (3°C par défaut)
+        if (weather_main_changed or not require_weather_change) and temp_change > temp_delta:
+            major_transitions += 1
+
+    return major_transitions
+
+# Timestamp epoch (UTC) d'une entrée 3h : list.dt, ou list.dt_txt si dt est absent
+def entry_timestamp(entry):
+    dt = entry.get("dt")
+    if dt is None:
+        import calendar
+        dt = calendar.timegm(time.strptime(entry["dt_txt"], DATETIME_FORMAT))
+    return dt
+
+# Numéro de jour local (jours depuis 1970-01-01) d'une entrée 3h, city.timezone en secondes
+def forecast_day_number(entry, tz_offset=0):
+    return (entry_timestamp(entry) + tz_offset) // SECONDS_PER_DAY
+
+# Date locale (date_local) correspondant à un numéro de jour, calculée une seule fois par jour
+@functools.lru_cache(maxsize=4096)
+def day_number_to_date(day_number):
+    return (EPOCH_DATE + timedelta(days=day_number)).strftime(DATE_FORMAT)
+
+# Catégories list.weather.main documentées par OpenWeatherMap, internées en petits entiers
+WEATHER_MAIN_CATEGORIES = (
+    "Clear", "Clouds", "Rain", "Drizzle", "Thunderstorm", "Snow",
+    "Mist", "Smoke", "Haze", "Dust", "Fog", "Sand", "Ash", "Squall", "Tornado",
+)
+_weather_codes = {name: code for code, name in enumerate(WEATHER_MAIN_CATEGORIES)}
+_weather_lock = threading.Lock()
+
+def weather_code(name):
+    # Code entier d'une catégorie ; une catégorie inconnue reçoit le code suivant
+    code = _weather_codes.get(name)
+    if code is None:
+        with _weather_lock:
+            code = _weather_codes.get(name)
+            if code is None:
+                code = len(_weather_codes)
+                _weather_codes[name] = code
+    return code
+
+# Statistiques dérivées disponibles : nom -> (chemin dans une entrée 3h, réduction, valeur si absent)
+DERIVED_METRICS = {
+    "temp_min": (("main", "temp"), "min", None),
+    "temp_max": (("main", "temp"), "max", None),
+    "temp_mean": (("main", "temp"), "mean", None),
+    "feels_like_mean": (("main", "feels_like"), "mean", None),
+    "humidity_mean": (("main", "humidity"), "mean", None),
+    "wind_speed_mean": (("wind", "speed"), "mean", None),
+    "wind_speed_max": (("wind", "speed"), "max", None),
+    "wind_gust_max": (("wind", "gust"), "max", None),
+    "pop_mean": (("pop",), "mean", None),
+    "pop_max": (("pop",), "max", None),
+    "clouds_mean": (("clouds", "all"), "mean", None),
+}
+METRIC_REDUCERS = ("min", "max", "sum", "mean")
+
+def register_metric(name, path, reducer, default=None):
+    """
+    Ajoute une statistique dérivée, ex. register_metric("rain_max", "rain.3h", "max", 0.0).
+
+    path : clés successives dans une entrée 3h (tuple ou texte séparé par des points).
+    default : valeur utilisée si le champ est absent (None : entrée ignorée pour cette statistique).
+    """
+    if reducer not in METRIC_REDUCERS:
+        raise ValueError(f"Réduction inconnue : {reducer} (disponibles : {', '.join(METRIC_REDUCERS)})")
+    if isinstance(path, str):
+        path = path.split(".")
+    DERIVED_METRICS[name] = (tuple(path), reducer, default)
+
+# Valeur numérique d'un champ d'une entrée 3h, default si le champ est absent
+def metric_input(entry, path, default=None):
+    value = entry
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+        if value is None:
+            return None if default is None else float(default)
+    return float(value)
+
+class MetricAccumulator:
+    """
+    Réduction au fil de l'eau d'une statistique (min, max, somme ou moyenne), valeurs absentes ignorées.
+    """
+    __slots__ = ("reducer", "value", "count")
+
+    def __init__(self, reducer, value=None, count=0):
+        self.reducer = reducer
+        self.value = value
+        self.count = count
+
+    def add(self, value):
+        if value is None:
+            return
+        self.count += 1
+        if self.value is None:
+            self.value = value
+        elif self.reducer == "min":
+            if value < self.value:
+                self.value = value
+        elif self.reducer == "max":
+            if value > self.value:
+                self.value = value
+        else:
+            self.value += value
+
+    def result(self):
+        if self.value is None:
+            return None
+        if self.reducer == "mean":
+            return round(self.value / self.count, 2)
+        return round(self.value, 2)
+
+class AggregationSpec:
+    """
+    Statistiques dérivées demandées et seuils des transitions majeures.
+
+    Les définitions sont copiées depuis DERIVED_METRICS à la construction : l'objet est
+    autonome et peut être envoyé aux processus du retraitement en masse.
+    """
+    __slots__ = ("metrics", "definitions", "temp_delta", "require_weather_change")
+
+    def __init__(self, metrics=(), temp_delta=TRANSITION_TEMP_DELTA, require_weather_change=TRANSITION_REQUIRE_WEATHER_CHANGE):
+        unknown = [name for name in metrics if name not in DERIVED_METRICS]
+        if unknown:
+            raise ValueError(f"Statistique(s) inconnue(s) : {', '.join(unknown)} (disponibles : {', '.join(DERIVED_METRICS)})")
+        self.metrics = tuple(dict.fromkeys(metrics))
+        self.definitions = tuple(DERIVED_METRICS[name] for name in self.metrics)
+        self.temp_delta = temp_delta
+        self.require_weather_change = require_weather_change
+
+    def is_default(self):
+        return (not self.metrics and self.temp_delta == TRANSITION_TEMP_DELTA
+                and self.require_weather_change == TRANSITION_REQUIRE_WEATHER_CHANGE)
+
+    def signature(self):
+        # Paramètres mémorisés dans l'état incrémental (None : sortie par défaut)
+        if self.is_default():
+            return None
+        return {"metrics": list(self.metrics), "temp_delta": self.temp_delta, "require_weather_change": self.require_weather_change}
+
+    def new_accumulators(self):
+        return [MetricAccumulator(reducer) for _, reducer, _ in self.definitions]
+
+    def add_entry(self, accumulators, entry):
+        for (path, _, default), accumulator in zip(self.definitions, accumulators):
+            accumulator.add(metric_input(entry, path, default))
+
+DEFAULT_AGGREGATION = AggregationSpec()
+
+# Enregistrements compacts (__slots__ : pas de dict par instance, catégorie météo en code entier)
+class DaySummary:
+    """
+    Agrégats d'un jour local. prev_temp et prev_weather (dernier créneau vu) servent au
+    comptage des transitions majeures au fil de l'eau ; metrics contient les
+    MetricAccumulator des statistiques dérivées demandées (None sinon).
+    """
+    __slots__ = ("day_number", "rain", "snow", "transitions", "prev_temp", "prev_weather", "metrics")
+
+    def __init__(self, day_number, prev_temp, prev_weather, metrics=None):
+        self.day_number = day_number
+        self.rain = 0.0
+        self.snow = 0.0
+        self.transitions = 0
+        self.prev_temp = prev_temp
+        self.prev_weather = prev_weather
+        self.metrics = metrics
+
+    def to_dict(self, metric_names=()):
+        # Élément de forecast_details
+        details = {
+            "date_local": day_number_to_date(self.day_number),
+            "rain_cumul_mm": round(self.rain, 2),
+            "snow_cumul_mm": round(self.snow, 2),
+            "major_transitions_count": self.transitions
+        }
+        if self.metrics:
+            for name, accumulator in zip(metric_names, self.metrics):
+                details[name] = accumulator.result()
+        return details
+
+class ForecastSummary:
+    """
+    Résultat de format_forecast sous forme compacte : to_dict() produit exactement le JSON formaté.
+    """
+    __slots__ = ("name", "country", "total_rain", "total_snow", "max_humidity", "days", "metrics")
+
+    def __init__(self, name, country, total_rain=0.0, total_snow=0.0, max_humidity=0, days=(), metrics=None):
+        self.name = name
+        self.country = country
+        self.total_rain = total_rain
+        self.total_snow = total_snow
+        self.max_humidity = max_humidity
+        self.days = tuple(days)
+        self.metrics = metrics or {}  # statistiques dérivées sur la période : nom -> valeur
+
+    def to_dict(self):
+        result = {
+            "forecast_location_name": self.name,
+            "country_code": self.country,
+            "total_rain_period_mm": self.total_rain,
+            "total_snow_period_mm": self.total_snow,
+            "max_humidity_period": self.max_humidity,
+        }
+        for name, value in self.metrics.items():
+            result[f"{name}_period"] = value
+        metric_names = tuple(self.metrics)
+        result["forecast_details"] = [day.to_dict(metric_names) for day in self.days]
+        return result
+
+# Transformation et mise en forme du résultat JSON
+def format_forecast(data, aggregation=None):
+    return format_forecast_stream(data["city"], data["list"], aggregation)
+
+# Résumé compact (ForecastSummary) d'un JSON raw, pour garder beaucoup de prévisions en mémoire
+def summarize_forecast(data, aggregation=None):
+    return summarize_forecast_stream(data["city"], data["list"], aggregation)
+
+# Formatage en une seule passe sur un itérateur d'entrées 3h (mémoire constante)
+def format_forecast_stream(city_info, entries, aggregation=None):
+    """
+    Produit le même résultat que format_forecast à partir de city et d'un itérable de list.
+
+    Chaque jour ne garde que ses cumuls et l'entrée précédente (temp + weather) : les
+    transitions majeures sont comptées au fil de l'eau, sans liste d'entrées par jour ni
+    second passage. entries peut donc être un générateur (JSON lu en streaming).
+
+    aggregation (AggregationSpec) ajoute les statistiques dérivées demandées, par jour
+    (forecast_details) et sur la période (<nom>_period), calculées dans la même passe,
+    et fixe les seuils des transitions majeures. None : sortie par défaut.
+    """
+    return summarize_forecast_stream(city_info, entries, aggregation).to_dict()
+
+def summarize_forecast_stream(city_info, entries, aggregation=None):
+    # Même calcul que format_forecast_stream, résultat en enregistrements compacts
+    spec = aggregation or DEFAULT_AGGREGATION
+    temp_delta = spec.temp_delta
+    require_weather_change = spec.require_weather_change
+    period_metrics = spec.new_accumulators() if spec.metrics else None
+
+    total_rain = 0.0
+    total_snow = 0.0
+    max_humidity = 0
+
+    # Décalage horaire de la ville (secondes) : les jours sont regroupés en heure locale
+    tz_offset = city_info.get("timezone", 0)
+
+    # numéro de jour -> DaySummary (ordre d'apparition conservé)
+    days = {}
+
+    for entry in entries:
+
+        # Regroupement par jour via le timestamp epoch list.dt (pas de parsing de dt_txt)
+        dt = entry.get("dt")
+        if dt is None:
+            dt = entry_timestamp(entry)
+        day_number = (dt + tz_offset) // SECONDS_PER_DAY
+
+        rain = entry["rain"].get("3h", 0.0) if "rain" in entry else 0.0
+        snow = entry["snow"].get("3h", 0.0) if "snow" in entry else 0.0
+
+        main = entry["main"]
+        temp = main["temp"]
+        humidity = main["humidity"]
+        # Extraction de list.weather.main en se basant sur la Doc API OpenWeatherMap (catégorie météo principale: Rain, Snow, Clouds, etc.)
+        weather = weather_code(entry["weather"][0]["main"])
+
+        # Mise à jour des totaux
+        total_rain += rain
+        total_snow += snow
+
+        if humidity > max_humidity:
+            max_humidity = humidity
+
+        # Vérifier si ce jour existe déjà (l'entrée précédente est l'entrée courante : pas de transition)
+        day = days.get(day_number)
+        if day is None:
+            day = days[day_number] = DaySummary(day_number, temp, weather, spec.new_accumulators() if period_metrics else None)
+
+        day.rain += rain
+        day.snow += snow
+
+        # Transition majeure si list.weather.main change ET variation temp > 3°C (seuils de spec, cf. calcul_major_transitions)
+        if (day.prev_weather != weather or not require_weather_change) and abs(day.prev_temp - temp) > temp_delta:
+            day.transitions += 1
+
+        day.prev_temp = temp
+        day.prev_weather = weather
+
+        # Statistiques dérivées du jour et de la période, dans la même passe
+        if period_metrics:
+            for (path, _, default), day_metric, period_metric in zip(spec.definitions, day.metrics, period_metrics):
+                value = metric_input(entry, path, default)
+                day_metric.add(value)
+                period_metric.add(value)
+
+    metrics = {name: metric.result() for name, metric in zip(spec.metrics, period_metrics)} if period_metrics else None
+    return ForecastSummary(city_info["name"], city_info["country"], total_rain, total_snow, max_humidity, days.values(), metrics)
+
+# Indices d'un créneau 3h mémorisé par le mode incrémental (liste : identique après aller-retour JSON)
+SLOT_TEMP, SLOT_HUMIDITY, SLOT_RAIN, SLOT_SNOW, SLOT_WEATHER, SLOT_INPUTS = range(6)
+
+# Valeurs d'une entrée 3h utiles à l'agrégation journalière
+def forecast_slot(entry, aggregation=None):
+    main = entry["main"]
+    slot = [
+        main["temp"],
+        main["humidity"],
+        entry["rain"].get("3h", 0.0) if "rain" in entry else 0.0,
+        entry["snow"].get("3h", 0.0) if "snow" in entry else 0.0,
+        entry["weather"][0]["main"],
+    ]
+    # Champs bruts des statistiques dérivées demandées ("main.temp" -> valeur)
+    if aggregation is not None and aggregation.metrics:
+        slot.append({".".join(path): metric_input(entry, path) for path, _, _ in aggregation.definitions})
+    return slot
+
+# État vide d'une ville pour le mode incrémental
+def new_forecast_state(city_info):
+    return {
+        "city": {"name": city_info["name"], "country": city_info["country"], "timezone": city_info.get("timezone", 0)},
+        "updated_at": None,
+        "slots": {},  # timestamp list.dt (texte) -> créneau (forecast_slot)
+        "days": {},  # numéro de jour local (texte) -> agrégats du jour
+    }
+
+# Agrégats d'un jour à partir de ses créneaux triés par timestamp
+def _add_slot_inputs(spec, accumulators, slot):
+    # Champs bruts mémorisés dans un créneau -> statistiques dérivées (valeur par défaut si absent)
+    inputs = slot[SLOT_INPUTS] if len(slot) > SLOT_INPUTS else {}
+    for (path, _, default), accumulator in zip(spec.definitions, accumulators):
+        value = inputs.get(".".join(path))
+        accumulator.add(value if value is not None or default is None else float(default))
+
+def _summarize_day(day_slots, spec=DEFAULT_AGGREGATION):
+    rain = 0.0
+    snow = 0.0
+    for slot in day_slots:
+        rain += slot[SLOT_RAIN]
+        snow += slot[SLOT_SNOW]
+    summary = {
+        "rain": rain,
+        "snow": snow,
+        "max_humidity": max(slot[SLOT_HUMIDITY] for slot in day_slots),
+        "transitions": calcul_major_transitions(
+            [{"temp": slot[SLOT_TEMP], "weather": slot[SLOT_WEATHER]} for slot in day_slots],
+            spec.temp_delta, spec.require_weather_change,
+        ),
+    }
+    # Réductions [valeur, nombre] des statistiques dérivées du jour
+    if spec.metrics:
+        accumulators = spec.new_accumulators()
+        for slot in day_slots:
+            _add_slot_inputs(spec, accumulators, slot)
+        summary["metrics"] = {name: [accumulator.value, accumulator.count] for name, accumulator in zip(spec.metrics, accumulators)}
+    return summary
+
+def _day_accumulators(day, spec):
+    # MetricAccumulator d'un jour mémorisé dans l'état
+    stored = day.get("metrics") or {}
+    return [MetricAccumulator(reducer, *stored.get(name, (None, 0))) for name, (_, reducer, _) in zip(spec.metrics, spec.definitions)]
+
+def _day_details(day_number, day, spec=DEFAULT_AGGREGATION):
+    # Même structure qu'un élément de forecast_details
+    details = {
+        "date_local": day_number_to_date(day_number),
+        "rain_cumul_mm": round(day["rain"], 2),
+        "snow_cumul_mm": round(day["snow"], 2),
+        "major_transitions_count": day["transitions"],
+    }
+    for name, accumulator in zip(spec.metrics, _day_accumulators(day, spec)):
+        details[name] = accumulator.result()
+    return details
+
+# Fusion d'une nouvelle fenêtre de prévision dans l'état d'une ville (mode incrémental)
+def merge_forecast(state, city_info, entries, fetched_at=None, keep_days=None, aggregation=None):
+    """
+    Met à jour state (new_forecast_state) avec les entrées 3h d'un nouvel appel.
+
+    Seuls les créneaux dont les valeurs ont changé sont remplacés, et seuls les jours
+    contenant un créneau modifié sont recalculés. Les créneaux absents du nouvel appel
+    (passé) sont conservés. keep_days limite l'historique aux N jours les plus récents.
+    Si aggregation (statistiques, seuils) diffère de l'appel précédent, tous les jours
+    mémorisés sont recalculés.
+
+    Retourne (jours modifiés au format forecast_details, nombre de créneaux modifiés).
+    """
+    spec = aggregation or DEFAULT_AGGREGATION
+    tz_offset = city_info.get("timezone", 0)
+    slots = state["slots"]
+    days = state["days"]
+    dirty = set()
+
+    # Statistiques ou seuils modifiés : tous les jours sont recalculés
+    signature = spec.signature()
+    if state.get("aggregation") != signature:
+        if signature is None:
+            del state["aggregation"]
+        else:
+            state["aggregation"] = signature
+        dirty.update((int(key) + tz_offset) // SECONDS_PER_DAY for key in slots)
+
+    # Changement de fuseau (rare) : tous les jours sont regroupés de nouveau
+    if state["city"]["timezone"] != tz_offset:
+        state["city"]["timezone"] = tz_offset
+        days.clear()
+        dirty.update((int(key) + tz_offset) // SECONDS_PER_DAY for key in slots)
+
+    changed_slots = 0
+    seen = set()
+    for entry in entries:
+        dt = entry_timestamp(entry)
+        day_number = (dt + tz_offset) // SECONDS_PER_DAY
+        seen.add(day_number)
+        key = str(dt)
+        slot = forecast_slot(entry, spec)
+        if slots.get(key) != slot:
+            slots[key] = slot
+            changed_slots += 1
+            dirty.add(day_number)
+
+    # Recalcul des jours touchés uniquement (au plus 8 créneaux par jour)
+    day_slots = {}
+    if dirty:
+        for key, slot in slots.items():
+            dt = int(key)
+            day_number = (dt + tz_offset) // SECONDS_PER_DAY
+            if day_number in dirty:
+                day_slots.setdefault(day_number, []).append((dt, slot))
+
+    changed_days = []
+    for day_number in sorted(day_slots):
+        summary = _summarize_day([slot for _, slot in sorted(day_slots[day_number], key=itemgetter(0))], spec)
+        previous = days.get(str(day_number))
+        summary["last_seen"] = previous.get("last_seen") if previous else None
+        days[str(day_number)] = summary
+        if previous is None or any(previous.get(name) != summary.get(name) for name in ("rain", "snow", "max_humidity", "transitions", "metrics")):
+            changed_days.append(_day_details(day_number, summary, spec))
+
+    # Date de dernière vue : jours présents dans ce nouvel appel
+    if fetched_at is not None:
+        state["updated_at"] = fetched_at
+        for day_number in seen:
+            days[str(day_number)]["last_seen"] = fetched_at
+
+    if keep_days is not None and days:
+        oldest = max(map(int, days)) - keep_days + 1
+        for key in [key for key in days if int(key) < oldest]:
+            del days[key]
+        for key in [key for key in slots if (int(key) + tz_offset) // SECONDS_PER_DAY < oldest]:
+            del slots[key]
+
+    return changed_days, changed_slots
+
+# Vue complète de l'état d'une ville (même structure que format_forecast, tous les jours conservés)
+def format_forecast_state(state, aggregation=None):
+    spec = aggregation or DEFAULT_AGGREGATION
+    ordered = sorted((int(key), day) for key, day in state["days"].items())
+    total_rain = 0.0
+    total_snow = 0.0
+    period_metrics = spec.new_accumulators()
+    # Totaux de la période sur les créneaux dans l'ordre chronologique : mêmes additions que format_forecast
+    for _, slot in sorted((int(key), slot) for key, slot in state["slots"].items()):
+        total_rain += slot[SLOT_RAIN]
+        total_snow += slot[SLOT_SNOW]
+        _add_slot_inputs(spec, period_metrics, slot)
+    result = {
+        "forecast_location_name": state["city"]["name"],
+        "country_code": state["city"]["country"],
+        "total_rain_period_mm": total_rain,
+        "total_snow_period_mm": total_snow,
+        "max_humidity_period": max((day["max_humidity"] for _, day in ordered), default=0),
+    }
+    for name, metric in zip(spec.metrics, period_metrics):
+        result[f"{name}_period"] = metric.result()
+    result["forecast_details"] = [_day_details(day_number, day, spec) for day_number, day in ordered]
+    return result
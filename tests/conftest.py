@@ -0,0 +1,16 @@
+# tests/conftest.py
+# weather_report importé depuis la racine du dépôt ; BASE_DIR redirigé vers un dossier temporaire
+# pour que Logs, Cache, State et JSON Output ne soient pas créés dans le dépôt
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import weather_report  # noqa: E402
+
+@pytest.fixture
+def wr(tmp_path, monkeypatch):
+    monkeypatch.setattr(weather_report, "BASE_DIR", str(tmp_path))
+    return weather_report
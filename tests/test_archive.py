@@ -0,0 +1,61 @@
+# tests/test_archive.py
+# Archive des JSON raw : aller-retour, filtres since/until, clé et enregistrement tronqué
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from common import make_payload  # noqa: E402
+
+def test_archive_round_trip_and_filters(wr, tmp_path):
+    path = str(tmp_path / "forecasts.wra")
+    paris, lyon = make_payload(1), make_payload(2)
+    wr.append_to_archive(paris, "Paris", "FR", fetched_at=1000, path=path)
+    wr.append_to_archive(lyon, " Lyon", "fr ", fetched_at=2000, path=path)
+    wr.append_to_archive(paris, "Paris", "FR", fetched_at=3000, path=path)
+
+    records = list(wr.iter_archive(path=path))
+    assert [(key, fetched_at) for key, fetched_at, _ in records] == [("paris|fr", 1000), ("lyon|fr", 2000), ("paris|fr", 3000)]
+    assert records[1][2] == lyon
+
+    assert [fetched_at for _, fetched_at, _ in wr.iter_archive([("PARIS", "fr")], path=path)] == [1000, 3000]
+    assert [fetched_at for _, fetched_at, _ in wr.iter_archive(since=1500, path=path)] == [2000, 3000]
+    assert [fetched_at for _, fetched_at, _ in wr.iter_archive(until=2000, path=path)] == [1000, 2000]
+    assert [fetched_at for _, fetched_at, _ in wr.iter_archive([("Paris", "FR")], since=1500, until=3000, path=path)] == [3000]
+
+def test_append_after_truncated_record(wr, tmp_path):
+    path = str(tmp_path / "forecasts.wra")
+    wr.append_to_archive(make_payload(1), "Paris", "FR", fetched_at=1000, path=path)
+    complete = os.path.getsize(path)
+    wr.append_to_archive(make_payload(2), "Lyon", "FR", fetched_at=2000, path=path)
+
+    # Interruption pendant l'écriture du deuxième enregistrement
+    with open(path, "r+b") as f:
+        f.truncate(complete + 40)
+    wr._archive_checked.discard(path)
+
+    wr.append_to_archive(make_payload(3), "Nice", "FR", fetched_at=3000, path=path)
+    wr.append_to_archive(make_payload(4), "Lille", "FR", fetched_at=4000, path=path)
+
+    records = list(wr.iter_archive(path=path))
+    assert [(key, fetched_at) for key, fetched_at, _ in records] == [("paris|fr", 1000), ("nice|fr", 3000), ("lille|fr", 4000)]
+    assert records[1][2] == make_payload(3)
+
+def test_archive_key_uses_api_city_for_locations(wr, tmp_path, monkeypatch):
+    path = str(tmp_path / "forecasts.wra")
+    monkeypatch.setitem(wr._archive_config, "enabled", True)
+    monkeypatch.setitem(wr._archive_config, "path", path)
+    data = make_payload(5)
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return data
+
+    monkeypatch.setattr(wr, "api_get", lambda url: Response())
+    monkeypatch.setattr(wr, "record_api_key_status", lambda api_key, valid: None)
+    wr.request_forecast_data("id=2988507", "", "key", location=wr.location_by_id(2988507))
+
+    city = data["city"]
+    assert [key for key, _, _ in wr.iter_archive(path=path)] == [wr.archive_key(city["name"], city["country"])]
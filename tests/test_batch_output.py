@@ -0,0 +1,21 @@
+# tests/test_batch_output.py
+# Mode batch : doublons de la liste de villes et noms des fichiers de JSON Output
+import os
+
+def test_load_city_list_dedupes_case_insensitively(wr):
+    lines = ["Paris,FR", "paris,fr", "  PARIS , Fr ", "# Lyon,FR", "", "New York,US", "new york,us", "Lyon"]
+    assert wr.load_city_list(lines) == [("Paris", "FR"), ("New York", "US")]
+
+def test_save_to_file_never_overwrites_generated_names(wr, tmp_path, monkeypatch):
+    monkeypatch.setattr(wr, "FILE_TIMESTAMP_FORMAT", "fixed")
+    homonyms = [{"forecast_location_name": "Springfield", "country_code": "US", "id": index} for index in range(3)]
+
+    paths = [wr.save_to_file(data) for data in homonyms]
+
+    output_dir = tmp_path / wr.JSON_OUTPUT_DIR_NAME
+    assert [os.path.basename(path) for path in paths] == ["Springfield_US_fixed.json", "Springfield_US_fixed_2.json", "Springfield_US_fixed_3.json"]
+    assert sorted(os.listdir(output_dir)) == sorted(os.path.basename(path) for path in paths)
+
+    # Nom fourni par l'appelant : le fichier est remplacé
+    assert wr.save_to_file({"id": 1}, "replay") == wr.save_to_file({"id": 2}, "replay")
+    assert (output_dir / "replay.json").read_text(encoding="utf-8").count('"id": 2') == 1
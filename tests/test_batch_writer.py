@@ -0,0 +1,69 @@
+# tests/test_batch_writer.py
+# Écriture groupée JSON Lines (.part puis renommage atomique) et rétention du dossier JSON Output
+import gzip
+import json
+import os
+import time
+
+def read_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return [json.loads(line) for line in f]
+
+def test_part_file_renamed_on_close(wr, tmp_path):
+    path = str(tmp_path / "out" / "batch.jsonl")
+    with wr.BatchOutputWriter(path, backend="json") as writer:
+        writer.write({"city": "Paris"})
+        writer.write_lines([b'{"city":"Lyon"}\n'])
+        assert os.path.exists(path + wr.PARTIAL_EXTENSION) and not os.path.exists(path)
+
+    assert not os.path.exists(path + wr.PARTIAL_EXTENSION)
+    assert read_lines(path) == [{"city": "Paris"}, {"city": "Lyon"}]
+    assert writer.count == 2
+
+def test_part_file_kept_on_error(wr, tmp_path):
+    path = str(tmp_path / "batch.jsonl")
+    try:
+        with wr.BatchOutputWriter(path, backend="json") as writer:
+            writer.write({"city": "Paris"})
+            raise KeyboardInterrupt
+    except KeyboardInterrupt:
+        pass
+
+    assert not os.path.exists(path)
+    assert read_lines(path + wr.PARTIAL_EXTENSION) == [{"city": "Paris"}]
+
+def test_gzip_checkpoint_truncation_and_append(wr, tmp_path):
+    # Tronquer à la taille d'un point de reprise puis reprendre en ajout donne un gzip valide
+    path = str(tmp_path / "batch.jsonl.gz")
+    writer = wr.BatchOutputWriter(path, compress=True, backend="json")
+    writer.write({"n": 1})
+    offset = writer.checkpoint()
+    writer.write({"n": 2})
+    writer.close(finalize=False)
+
+    with open(path + wr.PARTIAL_EXTENSION, "r+b") as f:
+        f.truncate(offset)
+    with wr.BatchOutputWriter(path, compress=True, backend="json", append=True) as writer:
+        writer.write({"n": 3})
+
+    assert read_lines(path) == [{"n": 1}, {"n": 3}]
+
+def test_cleanup_output_dir(wr, tmp_path):
+    output_dir = tmp_path / wr.JSON_OUTPUT_DIR_NAME
+    output_dir.mkdir()
+    now = time.time()
+    for index, days in enumerate((0, 1, 5, 10)):
+        path = output_dir / f"report_{index}.json"
+        path.write_text("{}")
+        os.utime(path, (now - days * 86400 - 60, now - days * 86400 - 60))
+    partial = output_dir / "batch.jsonl.part"
+    partial.write_text("")
+    os.utime(partial, (0, 0))
+
+    assert wr.cleanup_output_dir() == 0
+    assert wr.cleanup_output_dir(retention_days=7) == 1
+    assert wr.cleanup_output_dir(max_files=2) == 1
+    assert sorted(os.listdir(output_dir)) == ["batch.jsonl.part", "report_0.json", "report_1.json"]
+    assert wr.cleanup_output_dir(retention_days=1, max_files=5) == 1
+    assert sorted(os.listdir(output_dir)) == ["batch.jsonl.part", "report_0.json"]
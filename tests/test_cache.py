@@ -0,0 +1,85 @@
+# tests/test_cache.py
+# Cache disque des réponses brutes : durée de validité, éviction LRU et stale-while-revalidate
+import os
+import threading
+import time
+
+import pytest
+
+@pytest.fixture
+def api(wr, monkeypatch):
+    # Faux appel à l'API : chaque requête retourne un JSON numéroté
+    calls = []
+
+    def request_forecast_data(city, country, api_key, units=None, lang=None, location=None):
+        calls.append((city, country))
+        return {"city": city, "call": len(calls)}
+
+    monkeypatch.setattr(wr, "request_forecast_data", request_forecast_data)
+    monkeypatch.setattr(wr, "_cache_entry_count", None)
+    monkeypatch.setitem(wr._cache_config, "enabled", True)
+    monkeypatch.setitem(wr._cache_config, "ttl", 600)
+    monkeypatch.setitem(wr._cache_config, "stale_while_revalidate", False)
+    return calls
+
+def age_cache(wr, monkeypatch, seconds):
+    # Décale l'horloge de weather_report : les entrées existantes vieillissent de seconds
+    now = time.time() + seconds
+    monkeypatch.setattr(wr.time, "time", lambda: now)
+
+def test_cache_hit_within_ttl_and_miss_after(wr, api, monkeypatch):
+    assert wr.fetch_forecast_data("Paris", "FR", "key")["call"] == 1
+    assert wr.fetch_forecast_data(" paris ", "fr", "key")["call"] == 1
+    assert wr.fetch_forecast_data("Paris", "FR", "key", refresh=True)["call"] == 2
+    assert wr.fetch_forecast_data("Paris", "FR", "key", use_cache=False)["call"] == 3
+    assert len(api) == 3
+
+    age_cache(wr, monkeypatch, 601)
+    assert wr.fetch_forecast_data("Paris", "FR", "key")["call"] == 4
+    assert 0 <= wr.read_cache_age(wr.cache_key("Paris", "FR")) < 1
+
+def test_lru_eviction_keeps_recently_read_entries(wr, api, monkeypatch):
+    monkeypatch.setitem(wr._cache_config, "max_entries", 2)
+    for city in ("Paris", "Lyon"):
+        wr.fetch_forecast_data(city, "FR", "key")
+    paris, lyon = (wr._cache_path(wr.cache_key(city, "FR")) for city in ("Paris", "Lyon"))
+    os.utime(paris, (1000, 1000))
+    os.utime(lyon, (2000, 2000))
+
+    # read_cache_age ne modifie pas l'ordre d'éviction, read_cache_entry si
+    wr.read_cache_age(wr.cache_key("Lyon", "FR"))
+    wr.read_cache_entry(wr.cache_key("Paris", "FR"))
+    wr.fetch_forecast_data("Nice", "FR", "key")
+
+    assert os.path.exists(paris) and not os.path.exists(lyon)
+    assert len(os.listdir(os.path.dirname(paris))) == 2
+
+def test_stale_while_revalidate_serves_old_data_and_refreshes_once(wr, api, monkeypatch):
+    monkeypatch.setitem(wr._cache_config, "stale_while_revalidate", True)
+    monkeypatch.setitem(wr._cache_config, "stale_max", 3600)
+    wr.fetch_forecast_data("Paris", "FR", "key")
+
+    # Rafraîchissement bloqué jusqu'aux deux lectures périmées : un seul appel à l'API
+    release = threading.Event()
+    fake = wr.request_forecast_data
+
+    def slow_request(*args, **kwargs):
+        release.wait(5)
+        return fake(*args, **kwargs)
+
+    monkeypatch.setattr(wr, "request_forecast_data", slow_request)
+    age_cache(wr, monkeypatch, 601)
+    assert wr.fetch_forecast_data("Paris", "FR", "key")["call"] == 1
+    assert wr.fetch_forecast_data("Paris", "FR", "key")["call"] == 1
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name.startswith("cache-refresh-"):
+            thread.join(5)
+
+    assert len(api) == 2
+    data, _ = wr.read_cache_entry(wr.cache_key("Paris", "FR"))
+    assert data["call"] == 2
+
+    # Au-delà de stale_max : appel bloquant
+    age_cache(wr, monkeypatch, 601 + 3601)
+    assert wr.fetch_forecast_data("Paris", "FR", "key")["call"] == 3
@@ -0,0 +1,140 @@
+# tests/test_forecast_core.py
+# Non-régression de la mise en forme : résultats comparés à une sortie figée du formateur à base de dicts
+# (tests/data/format_forecast_golden.json, produite avant l'introduction de ForecastSummary / DaySummary)
+import copy
+import json
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.append(os.path.join(os.path.dirname(TESTS_DIR), "benchmarks"))
+
+import forecast_core  # noqa: E402
+from common import make_payload  # noqa: E402
+
+GOLDEN_PATH = os.path.join(TESTS_DIR, "data", "format_forecast_golden.json")
+
+# JSON raw déterministes : fuseaux variés, catégorie météo inconnue, entrées sans list.dt
+def golden_payloads():
+    payloads = [make_payload(seed, tz_offset=tz_offset) for seed, tz_offset in enumerate((0, 3600, -18000, 19800, 43200, -36000))]
+
+    unknown = copy.deepcopy(payloads[1])
+    for entry in unknown["list"][::3]:
+        entry["weather"][0]["main"] = "Volcanic ash"
+    payloads.append(unknown)
+
+    without_dt = copy.deepcopy(payloads[2])
+    for entry in without_dt["list"]:
+        del entry["dt"]
+    payloads.append(without_dt)
+
+    payloads.append(make_payload(99, entries=0))
+    return payloads
+
+def load_golden():
+    with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_format_forecast_matches_golden():
+    assert [forecast_core.format_forecast(data) for data in golden_payloads()] == load_golden()
+
+def test_summarize_forecast_matches_golden():
+    assert [forecast_core.summarize_forecast(data).to_dict() for data in golden_payloads()] == load_golden()
+
+# Mode incrémental : la vue complète de l'état doit être identique à format_forecast pour les mêmes entrées
+def merged_state(data, aggregation=None, steps=1):
+    state = forecast_core.new_forecast_state(data["city"])
+    entries = data["list"]
+    for step in range(1, steps + 1):
+        forecast_core.merge_forecast(state, data["city"], entries[:len(entries) * step // steps], aggregation=aggregation)
+    # Aller-retour JSON comme lors de la sauvegarde dans le dossier State
+    return json.loads(json.dumps(state))
+
+def test_format_forecast_state_matches_format_forecast():
+    for data in golden_payloads() + [make_payload(seed) for seed in range(100, 150)]:
+        assert forecast_core.format_forecast_state(merged_state(data)) == forecast_core.format_forecast(data)
+
+def test_format_forecast_state_after_successive_merges():
+    for seed in range(200, 230):
+        data = make_payload(seed, tz_offset=-18000)
+        assert forecast_core.format_forecast_state(merged_state(data, steps=3)) == forecast_core.format_forecast(data)
+
+# Statistiques dérivées et seuils des transitions (AggregationSpec)
+def small_payload():
+    # Deux jours UTC : 4 créneaux le 1er janvier 2026, 2 le 2 ; pop absente d'un créneau
+    start = 1767225600  # 2026-01-01 00:00 UTC
+    slots = [
+        (10.0, "Clear", 2.0, 0.5), (14.5, "Rain", 6.0, 0.8), (16.0, "Rain", 4.0, None), (11.0, "Clouds", 1.0, 0.1),
+        (-2.0, "Snow", 9.0, 1.0), (-1.0, "Clear", 3.0, 0.0),
+    ]
+    entries = []
+    for index, (temp, weather, wind, pop) in enumerate(slots):
+        day, hour = divmod(index, 4)
+        entry = {
+            "dt": start + day * 86400 + hour * 3 * 3600,
+            "main": {"temp": temp, "humidity": 50 + index},
+            "weather": [{"main": weather}],
+            "wind": {"speed": wind},
+        }
+        if pop is not None:
+            entry["pop"] = pop
+        entries.append(entry)
+    return {"city": {"name": "Test", "country": "FR", "timezone": 0}, "list": entries}
+
+def test_derived_metrics_per_day_and_period():
+    spec = forecast_core.AggregationSpec(["temp_min", "temp_mean", "wind_speed_max", "pop_mean"])
+    result = forecast_core.format_forecast(small_payload(), spec)
+
+    assert result["temp_min_period"] == -2.0
+    assert result["temp_mean_period"] == round((10.0 + 14.5 + 16.0 + 11.0 - 2.0 - 1.0) / 6, 2)
+    assert result["wind_speed_max_period"] == 9.0
+    assert result["pop_mean_period"] == round((0.5 + 0.8 + 0.1 + 1.0 + 0.0) / 5, 2)  # créneau sans pop ignoré
+
+    first, second = result["forecast_details"]
+    assert first["temp_min"] == 10.0 and first["temp_mean"] == 12.88 and first["wind_speed_max"] == 6.0
+    assert first["pop_mean"] == round((0.5 + 0.8 + 0.1) / 3, 2)
+    assert second["temp_min"] == -2.0 and second["pop_mean"] == 0.5
+    # Les champs par défaut sont inchangés et placés en premier
+    assert list(first)[:4] == ["date_local", "rain_cumul_mm", "snow_cumul_mm", "major_transitions_count"]
+
+def test_default_aggregation_adds_nothing():
+    data = small_payload()
+    assert forecast_core.format_forecast(data, forecast_core.AggregationSpec()) == forecast_core.format_forecast(data)
+
+def test_register_metric_and_unknown_metric():
+    forecast_core.register_metric("wind_speed_sum", "wind.speed", "sum")
+    try:
+        result = forecast_core.format_forecast(small_payload(), forecast_core.AggregationSpec(["wind_speed_sum"]))
+        assert result["wind_speed_sum_period"] == 25.0
+        assert [day["wind_speed_sum"] for day in result["forecast_details"]] == [13.0, 12.0]
+    finally:
+        del forecast_core.DERIVED_METRICS["wind_speed_sum"]
+
+    try:
+        forecast_core.AggregationSpec(["wind_speed_sum"])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("statistique inconnue acceptée")
+
+def test_transition_thresholds():
+    data = small_payload()
+    counts = lambda spec: [day["major_transitions_count"] for day in forecast_core.format_forecast(data, spec)["forecast_details"]]
+
+    # Par défaut : Clear->Rain +4.5 et Rain->Clouds -5 (Rain->Rain +1.5 n'a pas de changement de catégorie)
+    assert counts(None) == [2, 0]
+    assert counts(forecast_core.AggregationSpec(temp_delta=4.5)) == [1, 0]
+    # Sans changement de catégorie exigé : seule la variation de température compte
+    assert counts(forecast_core.AggregationSpec(temp_delta=1, require_weather_change=False)) == [3, 0]
+    assert counts(forecast_core.AggregationSpec(temp_delta=0.5, require_weather_change=False)) == [3, 1]
+    assert forecast_core.calcul_major_transitions(
+        [{"temp": 0, "weather": "Rain"}, {"temp": 2, "weather": "Rain"}], temp_delta=1, require_weather_change=False
+    ) == 1
+
+def test_aggregation_stream_and_state_agree():
+    spec = forecast_core.AggregationSpec(list(forecast_core.DERIVED_METRICS), temp_delta=2, require_weather_change=False)
+    payloads = golden_payloads() + [small_payload()]
+    stream = [forecast_core.format_forecast(data, spec) for data in payloads]
+
+    assert [forecast_core.format_forecast_state(merged_state(data, spec), spec) for data in payloads] == stream
@@ -0,0 +1,115 @@
+# tests/test_rate_limit.py
+# Seau à jetons partagé et nouvelles tentatives de api_get (Retry-After, backoff), avec horloge et session simulées
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = b"{}"
+
+class FakeSession:
+    # Retourne (ou lève) les éléments de outcomes dans l'ordre
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+@pytest.fixture
+def clock(wr, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(wr.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(wr.time, "sleep", clock.sleep)
+    return clock
+
+@pytest.fixture
+def session(wr, monkeypatch, clock):
+    def install(outcomes, max_retries=3):
+        fake = FakeSession(outcomes)
+        monkeypatch.setattr(wr, "_http_session", fake)
+        monkeypatch.setattr(wr, "_rate_limiter", wr.TokenBucket(0))
+        monkeypatch.setitem(wr._retry_config, "max_retries", max_retries)
+        # Backoff déterministe : borne haute du "full jitter"
+        monkeypatch.setattr(wr.random, "uniform", lambda low, high: high)
+        return fake
+    return install
+
+def test_token_bucket_burst_then_steady_rate(wr, clock):
+    bucket = wr.TokenBucket(calls_per_minute=60, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+    assert bucket.acquire() == pytest.approx(1.0)
+
+    # Les jetons s'accumulent pendant l'inactivité, sans dépasser la capacité
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(1.0)
+
+def test_token_bucket_pause_and_unlimited(wr, clock):
+    bucket = wr.TokenBucket(calls_per_minute=600, capacity=5)
+    bucket.pause(7)
+    bucket.pause(2)  # une pause plus courte ne raccourcit pas la pause en cours
+    assert bucket.acquire() == pytest.approx(7.0)
+
+    unlimited = wr.TokenBucket(calls_per_minute=0)
+    assert [unlimited.acquire() for _ in range(100)] == [0.0] * 100
+    assert clock.sleeps == [7.0]
+
+def test_retry_after_seconds_and_http_date(wr):
+    assert wr._retry_after_seconds(FakeResponse(429, {"Retry-After": "12"})) == 12
+    assert wr._retry_after_seconds(FakeResponse(429, {"Retry-After": "100000"})) == wr.API_RETRY_AFTER_MAX_SECONDS
+    assert wr._retry_after_seconds(FakeResponse(429, {"Retry-After": "soon"})) is None
+    assert wr._retry_after_seconds(FakeResponse(429)) is None
+
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < wr._retry_after_seconds(FakeResponse(503, {"Retry-After": date})) <= 30
+
+def test_api_get_honours_retry_after_and_pauses_all_callers(wr, session, clock, monkeypatch):
+    fake = session([FakeResponse(429, {"Retry-After": "7"}), FakeResponse(200)])
+    limiter = wr.TokenBucket(calls_per_minute=6000, capacity=10)
+    monkeypatch.setattr(wr, "_rate_limiter", limiter)
+
+    assert wr.api_get("http://api").status_code == 200
+    assert fake.calls == 2
+    assert clock.sleeps == [7.0]
+    assert limiter.paused_until == pytest.approx(1007.0)
+
+def test_api_get_backoff_on_server_and_network_errors(wr, session, clock):
+    fake = session([FakeResponse(503), requests.exceptions.ConnectionError(), FakeResponse(502), FakeResponse(200)])
+    assert wr.api_get("http://api").status_code == 200
+    assert fake.calls == 4
+    base = wr.API_BACKOFF_BASE_SECONDS
+    assert clock.sleeps == [base, base * 2, base * 4]
+
+def test_api_get_returns_last_response_or_raises(wr, session, clock):
+    session([FakeResponse(500)] * 3, max_retries=2)
+    assert wr.api_get("http://api").status_code == 500
+
+    session([FakeResponse(404), FakeResponse(200)])
+    assert wr.api_get("http://api").status_code == 404
+
+    session([requests.exceptions.Timeout()] * 2, max_retries=1)
+    with pytest.raises(requests.exceptions.Timeout):
+        wr.api_get("http://api")
@@ -0,0 +1,95 @@
+# tests/test_reprocess.py
+# Retraitement en masse : reprise après interruption et empreintes des tâches
+import gzip
+import json
+import os
+import sys
+
+import click
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from common import make_payload  # noqa: E402
+
+@pytest.fixture
+def raw_dir(tmp_path):
+    # 7 JSON raw (dont 2 compressés et 1 illisible) : 4 tâches de 2
+    directory = tmp_path / "raw"
+    (directory / "b").mkdir(parents=True)
+    for index in range(5):
+        (directory / f"{index:03d}.json").write_text(json.dumps(make_payload(index)), encoding="utf-8")
+    with gzip.open(directory / "b" / "005.json.gz", "wt", encoding="utf-8") as f:
+        json.dump(make_payload(5), f)
+    (directory / "b" / "006.json").write_text("{not json", encoding="utf-8")
+    return directory
+
+def interrupt_after(wr, monkeypatch, chunks):
+    # Ctrl+C simulé dans le processus principal, juste après le point de reprise de la tâche n° chunks
+    save = wr._save_checkpoint
+
+    def save_then_interrupt(path, checkpoint):
+        save(path, checkpoint)
+        if len(checkpoint["done"]) == chunks:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(wr, "_save_checkpoint", save_then_interrupt)
+
+def read_sources(path):
+    with open(path, "rb") as f:
+        return [json.loads(line)["source"] for line in f]
+
+def test_resume_after_interruption(wr, raw_dir, tmp_path, monkeypatch):
+    output = str(tmp_path / "out.jsonl")
+    with monkeypatch.context() as patch:
+        interrupt_after(wr, patch, 2)
+        assert wr.reprocess_raw_forecasts(str(raw_dir), output, workers=1, chunk_size=2, backend="json") == (None, 4, 0)
+    assert os.path.exists(output + wr.CHECKPOINT_EXTENSION) and not os.path.exists(output)
+
+    # Lignes écrites après le dernier point de reprise : supprimées à la reprise
+    with open(output + wr.PARTIAL_EXTENSION, "ab") as f:
+        f.write(b'{"source":"partial"}\n')
+
+    path, count, errors = wr.reprocess_raw_forecasts(str(raw_dir), output, workers=1, chunk_size=5, backend="json")
+    assert (path, count, errors) == (output, 6, 1)
+    expected = ["000.json", "001.json", "002.json", "003.json", "004.json", os.path.join("b", "005.json.gz")]
+    assert sorted(read_sources(output)) == expected
+    assert not os.path.exists(output + wr.CHECKPOINT_EXTENSION)
+
+def test_resume_refused_when_source_changed(wr, raw_dir, tmp_path, monkeypatch):
+    output = str(tmp_path / "out.jsonl")
+    with monkeypatch.context() as patch:
+        interrupt_after(wr, patch, 2)
+        wr.reprocess_raw_forecasts(str(raw_dir), output, workers=1, chunk_size=2, backend="json")
+
+    # Fichier ajouté en tête : les tâches déjà faites ne correspondent plus aux mêmes fichiers
+    added = raw_dir / "000a.json"
+    added.write_text(json.dumps(make_payload(9)), encoding="utf-8")
+    with pytest.raises(click.ClickException, match="tâche 0"):
+        wr.reprocess_raw_forecasts(str(raw_dir), output, workers=1, backend="json")
+    added.unlink()
+
+    # Fichiers supprimés en fin de liste : la tâche 0 est inchangée mais la tâche 1, déjà faite, n'existe plus
+    for name in ("002.json", "003.json", "004.json", "b/005.json.gz", "b/006.json"):
+        (raw_dir / name).unlink()
+    with pytest.raises(click.ClickException, match="supprimés"):
+        wr.reprocess_raw_forecasts(str(raw_dir), output, workers=1, backend="json")
+
+def test_chunk_fingerprints(wr, raw_dir):
+    chunks = list(wr._iter_reprocess_chunks("directory", str(raw_dir), 3))
+    assert [chunk_id for chunk_id, _ in chunks] == [0, 1, 2]
+    assert chunks[0][1] == ["000.json", "001.json", "002.json"]
+    assert [len(chunk) for _, chunk in chunks] == [3, 3, 1]
+
+    fingerprints = [wr._chunk_fingerprint(chunk) for _, chunk in chunks]
+    assert len(set(fingerprints)) == 3
+    assert wr._chunk_fingerprint(list(chunks[0][1])) == fingerprints[0]
+    assert wr._chunk_fingerprint(["000.json", "001.json", "002a.json"]) != fingerprints[0]
+
+    # Archive : l'empreinte porte sur les en-têtes (clé, date, position, taille, CRC), après aller-retour JSON
+    archive = str(raw_dir.parent / "forecasts.wra")
+    for index in range(3):
+        wr.append_to_archive(make_payload(index), "Paris", "FR", fetched_at=1000 + index, path=archive)
+    (_, records), = wr._iter_reprocess_chunks("archive", archive, 10)
+    assert len(records) == 3
+    assert wr._chunk_fingerprint(json.loads(json.dumps(records))) == wr._chunk_fingerprint(records)
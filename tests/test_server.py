@@ -0,0 +1,54 @@
+# tests/test_server.py
+# Serveur de rapports : requêtes mal formées et corps de requête sur une connexion keep-alive
+import asyncio
+import re
+
+def exchange(wr, request):
+    # Envoie request (bytes) au serveur et retourne tout ce qu'il répond jusqu'à la fermeture de la connexion
+    async def run():
+        server = wr.ReportServer("key")
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response.decode("latin-1")
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.executor.shutdown(wait=False)
+
+    return asyncio.run(run())
+
+def statuses(response):
+    return [int(status) for status in re.findall(r"HTTP/1\.1 (\d{3}) ", response)]
+
+def test_request_body_is_drained_before_next_request(wr):
+    # Corps ressemblant à une requête : s'il n'était pas lu, il serait traité comme la requête suivante (404)
+    body = b"GET /unknown HTTP/1.1\r\n\r\n"
+    request = b"POST /report HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+    response = exchange(wr, request + b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert statuses(response) == [405, 200]
+
+def test_chunked_body_is_rejected(wr):
+    response = exchange(wr, b"POST /report HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n0\r\n\r\nGET /health HTTP/1.1\r\n\r\n")
+    assert statuses(response) == [411]
+    assert "Connection: close" in response
+
+def test_oversized_and_invalid_content_length(wr):
+    assert statuses(exchange(wr, b"POST /report HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % (wr.SERVER_MAX_BODY_BYTES + 1))) == [413]
+    assert statuses(exchange(wr, b"POST /report HTTP/1.1\r\nContent-Length: -1\r\n\r\n")) == [400]
+
+def test_too_many_headers(wr):
+    headers = b"".join(b"X-Header-%d: 1\r\n" % index for index in range(wr.SERVER_MAX_HEADER_LINES + 1))
+    response = exchange(wr, b"GET /health HTTP/1.1\r\n" + headers + b"\r\nGET /health HTTP/1.1\r\n\r\n")
+    assert statuses(response) == [431]
+
+def test_malformed_lines(wr):
+    assert statuses(exchange(wr, b"GET /health HTTP/1.1\r\nno colon here\r\n\r\n")) == [400]
+    assert statuses(exchange(wr, b"GET /health\r\n\r\n")) == [400]
+    # Ligne plus longue que la limite du StreamReader (64 Kio)
+    assert statuses(exchange(wr, b"GET /health HTTP/1.1\r\nX-Long: " + b"a" * 70000 + b"\r\n\r\n")) == [400]
@@ -0,0 +1,99 @@
+# tests/test_watch.py
+# Mode surveillance : ordre du tas des échéances et générations des villes retirées puis rajoutées
+import pytest
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+class FakeExecutor:
+    # Rafraîchissements enregistrés au lieu d'être exécutés
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, pair):
+        self.submitted.append(pair)
+
+@pytest.fixture
+def scheduler(wr, tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(wr.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(wr, "resolve_location", lambda city, country: None)
+    monkeypatch.setitem(wr._aggregation_config, "spec", None)
+    # Âge du cache par ville : Lyon le plus ancien, Paris absent du cache
+    ages = {wr.cache_key("Lyon", "FR"): 500.0, wr.cache_key("Nice", "FR"): 10.0}
+    monkeypatch.setattr(wr, "read_cache_age", ages.get)
+
+    watchlist = tmp_path / "villes.txt"
+    scheduler = wr.WatchScheduler(str(watchlist), api_key="key", interval=90, jitter=0)
+    scheduler.executor.shutdown()
+    scheduler.executor = FakeExecutor()
+
+    def load(*cities):
+        watchlist.write_text("\n".join(cities), encoding="utf-8")
+        scheduler.reload(force=True)
+
+    def advance(seconds):
+        clock.now += seconds
+        return scheduler.run_pending()
+
+    scheduler.load, scheduler.advance, scheduler.clock = load, advance, clock
+    return scheduler
+
+def finish_all(scheduler):
+    # Fin des rafraîchissements en cours (normalement faite par refresh dans le pool)
+    scheduler.running.clear()
+
+def test_first_pass_oldest_cache_first_then_fixed_interval(scheduler):
+    scheduler.load("Nice,FR", "Lyon,FR", "Paris,FR")
+    submitted = scheduler.executor.submitted
+
+    assert scheduler.advance(0) == pytest.approx(30)
+    assert submitted == [("Paris", "FR")]
+    scheduler.advance(30)
+    scheduler.advance(30)
+    assert submitted == [("Paris", "FR"), ("Lyon", "FR"), ("Nice", "FR")]
+
+    finish_all(scheduler)
+    assert scheduler.advance(30) == pytest.approx(30)
+    assert submitted[3:] == [("Paris", "FR")]
+    assert len(scheduler.heap) == 3
+
+def test_overlapping_refresh_is_skipped(scheduler):
+    scheduler.load("Paris,FR")
+    scheduler.advance(0)
+    # Rafraîchissement précédent toujours en cours : échéance sautée mais replanifiée
+    scheduler.advance(90)
+    assert scheduler.executor.submitted == [("Paris", "FR")]
+    finish_all(scheduler)
+    scheduler.advance(90)
+    assert scheduler.executor.submitted == [("Paris", "FR")] * 2
+
+def test_removed_then_readded_city_is_scheduled_once(scheduler):
+    paris = ("Paris", "FR")
+    submitted = scheduler.executor.submitted
+    scheduler.load("Paris,FR", "Lyon,FR")
+    old_generation = scheduler.cities[paris]
+    scheduler.advance(0)  # t=1000 : Paris, replanifiée à 1090
+    finish_all(scheduler)
+
+    # Paris retirée puis rajoutée : nouvelle génération planifiée tout de suite, l'ancienne entrée reste dans le tas
+    scheduler.load("Lyon,FR")
+    scheduler.advance(45)  # t=1045 : Lyon
+    finish_all(scheduler)
+    scheduler.load("Lyon,FR", "Paris,FR")
+    new_generation = scheduler.cities[paris]
+    assert new_generation != old_generation
+    assert sorted(entry[3] for entry in scheduler.heap if entry[2] == paris) == [old_generation, new_generation]
+
+    del submitted[:]
+    scheduler.advance(0)  # t=1045 : Paris (nouvelle génération)
+    finish_all(scheduler)
+    scheduler.advance(45)  # t=1090 : ancienne entrée de Paris ignorée et non replanifiée
+    assert submitted == [paris]
+    assert [entry[3] for entry in scheduler.heap if entry[2] == paris] == [new_generation]
+    scheduler.advance(45)  # t=1135 : Paris et Lyon
+    assert sorted(submitted) == [("Lyon", "FR"), paris, paris]
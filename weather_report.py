@@ -1,10 +1,42 @@
 # weather_report.py
-import requests
 import json
+import gzip
+import hashlib
+import heapq
+import mmap
+import struct
+import time
+import zlib
 import click
-from loguru import logger
 import os
-from datetime import datetime
+import random
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs, urlencode
+import threading
+
+# Fonctions pures de mise en forme (réexportées : weather_report.format_forecast reste disponible)
+from forecast_core import (  # noqa: F401
+    DATE_FORMAT,
+    DATETIME_FORMAT,
+    SECONDS_PER_DAY,
+    DERIVED_METRICS,
+    AggregationSpec,
+    register_metric,
+    calcul_major_transitions,
+    entry_timestamp,
+    forecast_day_number,
+    day_number_to_date,
+    format_forecast,
+    format_forecast_stream,
+    summarize_forecast,
+    format_forecast_state,
+    merge_forecast,
+    new_forecast_state,
+)
+
+# Les dépendances lourdes (requests, loguru, asyncio) sont importées à la première utilisation
 
 # Variables globales pour le répertoire de base et les chemins
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -12,24 +44,138 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Constantes pour les noms de dossiers
 LOGS_DIR_NAME = "Logs"
 JSON_OUTPUT_DIR_NAME = "JSON Output"
+CACHE_DIR_NAME = "Cache"
+STATE_DIR_NAME = "State"
+ARCHIVE_DIR_NAME = "Archive"
 
 # Constantes pour les fichiers
 CONFIG_FILE_NAME = "local.conf"
+API_KEY_STATE_FILE_NAME = ".api_key_state.json"
+ARCHIVE_FILE_NAME = "forecasts.wra"
 JSON_EXTENSION = ".json"
+JSONL_EXTENSION = ".jsonl"
+GZIP_EXTENSION = ".gz"
+PARTIAL_EXTENSION = ".part"
+BATCH_FILE_PREFIX = "batch_"
+REPROCESS_FILE_PREFIX = "reprocess_"
+CHECKPOINT_EXTENSION = ".checkpoint.json"
 LOG_FILE_PREFIX = "weather_report_"
+ASCII_ART_FILE_NAME = "ascii_art.txt"
+CITY_INDEX_FILE_NAME = "city_index.wci"
 
-# Constantes pour les formats de date
-DATE_FORMAT = "%Y-%m-%d"  # Format pour les dates locales
-DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # Format pour les timestamps API
+# Constantes pour les formats de date (DATE_FORMAT et DATETIME_FORMAT : voir forecast_core)
 LOG_DATE_FORMAT = "%Y%m%d"  # Format pour les noms de fichiers de log
 FILE_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"  # Format pour les timestamps de fichiers
+REPLAY_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S_%f"  # Date de récupération d'un enregistrement rejoué (replay --save)
 
 # Constante par défaut pour la création de JSON output formattée
 DEFAULT_CITY_NAME = "weather"
 
+# Constantes pour l'API OpenWeatherMap et la couche HTTP partagée
+API_FORECAST_URL = "http://api.openweathermap.org/data/2.5/forecast"
+HTTP_POOL_CONNECTIONS = 4  # Nombre d'hôtes distincts gardés en cache de connexions
+HTTP_POOL_MAXSIZE = 16  # Nombre maximum de connexions keep-alive par hôte
+HTTP_POOL_BLOCK = True  # Attendre une connexion libre plutôt que dépasser la limite par hôte
+API_TIMEOUT_SECONDS = 10  # Timeout par défaut de chaque requête (connexion et lecture)
+DEFAULT_UNITS = "metric"
+DEFAULT_LANG = "fr"
+COORD_DECIMALS = 4  # Précision des coordonnées dans les requêtes et les clés de cache
+
+# Format de l'index local des villes (construit depuis city.list.json.gz d'OpenWeatherMap) :
+# en-tête (magic, nombre de villes) + table des offsets (uint32) triée par nom normalisé + enregistrements
+# (identifiant, lat, lon, pays, taille du nom normalisé, taille du nom) suivis du nom normalisé et du nom
+CITY_INDEX_MAGIC = b"WCI1"
+CITY_INDEX_HEADER = struct.Struct("<4sI")
+CITY_INDEX_OFFSET = struct.Struct("<I")
+CITY_INDEX_RECORD = struct.Struct("<Iff2sBB")
+CITY_SEARCH_LIMIT = 20
+
+# Constantes pour la limitation de débit et les nouvelles tentatives
+RATE_LIMIT_CALLS_PER_MINUTE = 60  # Limite du plan gratuit OpenWeatherMap (0 : pas de limite)
+RATE_LIMIT_BURST = 10  # Nombre d'appels pouvant partir d'un coup avant d'être lissés
+API_MAX_RETRIES = 4
+API_BACKOFF_BASE_SECONDS = 0.5
+API_BACKOFF_MAX_SECONDS = 30
+API_RETRY_AFTER_MAX_SECONDS = 120  # Attente maximale acceptée depuis l'en-tête Retry-After
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Constantes pour le cache disque des réponses de l'API
+CACHE_TTL_SECONDS = 30 * 60  # Durée de validité d'une réponse en cache
+CACHE_MAX_ENTRIES = 5000  # Nombre maximum de réponses gardées (éviction LRU au-delà)
+CACHE_STALE_MAX_SECONDS = 24 * 3600  # Âge maximum d'une réponse périmée servie pendant son rafraîchissement
+CACHE_HEADER_READ_SIZE = 4096  # Caractères lus en tête d'une entrée de cache pour obtenir son âge (clé + fetched_at)
+
+# Constantes pour l'écriture groupée (JSON Lines) des résultats
+OUTPUT_FORMATS = ["files", "jsonl", "jsonl.gz"]  # files : un fichier JSON indenté par ville (historique)
+JSON_BACKENDS = ["auto", "json", "orjson"]  # auto : orjson si installé, sinon json
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+# Constantes pour le mode service HTTP (commande serve)
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8080
+DEFAULT_SERVER_WORKERS = 32  # Requêtes API simultanées vers OpenWeatherMap
+SERVER_KEEP_ALIVE_SECONDS = 15  # Attente maximale d'une requête suivante sur une connexion
+SERVER_MAX_HEADER_LINES = 100
+SERVER_MAX_BODY_BYTES = 64 * 1024  # Corps de requête lu puis ignoré (aucune route n'en utilise)
+SERVER_PATHS = {"/report", "/health", "/metrics"}
+
+# Constantes pour le mode surveillance (commande watch)
+WATCH_INTERVAL_SECONDS = 3600  # Intervalle de rafraîchissement de chaque ville
+WATCH_JITTER = 0.1  # Variation aléatoire de l'intervalle (± 10 %)
+WATCH_RELOAD_CHECK_SECONDS = 5  # Fréquence de vérification des modifications de la liste et de local.conf
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required", 413: "Content Too Large", 431: "Request Header Fields Too Large",
+                500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+# Messages des requêtes mal formées (la connexion est fermée après la réponse)
+SERVER_REQUEST_ERRORS = {
+    400: "Requête HTTP invalide",
+    411: "Content-Length obligatoire pour une requête avec corps",
+    413: "Corps de requête trop volumineux",
+    431: "En-têtes de requête trop nombreux",
+}
+
+# Format des enregistrements de l'archive des JSON raw :
+# en-tête (magic, taille du JSON compressé, CRC32, date de récupération, taille de la clé) + clé "ville|pays" + JSON compressé zlib
+ARCHIVE_RECORD_MAGIC = b"WRA1"
+ARCHIVE_HEADER = struct.Struct("<4sIIdH")
+ARCHIVE_COMPRESSION_LEVEL = 6
+
+# Durée pendant laquelle le résultat de vérification d'une clé API est réutilisé
+API_KEY_STATE_TTL_SECONDS = 24 * 3600
+# Plus courte pour une clé invalide : une nouvelle clé OpenWeatherMap peut mettre du temps à s'activer
+API_KEY_INVALID_STATE_TTL_SECONDS = 15 * 60
+
+# Constantes pour le mode batch (plusieurs villes)
+DEFAULT_BATCH_WORKERS = 8  # Nombre de requêtes simultanées par défaut
+BATCH_COMMENT_PREFIX = "#"  # Lignes ignorées dans le fichier de villes
+
+# Constantes pour le retraitement en masse (commande reprocess)
+REPROCESS_CHUNK_SIZE = 256  # JSON raw par tâche envoyée à un processus
+REPROCESS_INFLIGHT_PER_WORKER = 2  # Tâches en attente par processus (mémoire bornée)
+
+# Constantes pour le mode incrémental (état par ville et par jour, sortie delta)
+INCREMENTAL_KEEP_DAYS = 10  # Jours d'historique gardés dans l'état de chaque ville
+DELTA_FILE_SUFFIX = "_delta"
+
+# Constantes pour les métriques (chronométrage des étapes, compteurs, export Prometheus)
+METRICS_PREFIX = "weather_report"
+METRICS_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # Secondes
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_DEFINITIONS = {
+    "stage_duration_seconds": ("histogram", "Durée de chaque étape (verify_api_key, fetch, json_decode, format, merge, save)"),
+    "api_requests_total": ("counter", "Requêtes HTTP envoyées à l'API, par code de réponse"),
+    "api_retries_total": ("counter", "Nouvelles tentatives après un 429, un 5xx ou une erreur réseau"),
+    "api_bytes_downloaded_total": ("counter", "Octets reçus de l'API (corps des réponses)"),
+    "cache_lookups_total": ("counter", "Lectures du cache, par résultat (hit, stale, miss)"),
+    "reports_total": ("counter", "Rapports générés, par résultat (ok, error, unchanged en mode incrémental)"),
+    "errors_total": ("counter", "Erreurs de récupération, par type (code HTTP de l'API ou network)"),
+    "server_requests_total": ("counter", "Requêtes reçues par le serveur (commande serve), par chemin et code"),
+}
+
 # Configuration des logs avec loguru
 def setup_logging():
    # Configure le dossier Logs et initialise loguru pour les logs.
+    from loguru import logger
+
     logs_dir = os.path.join(BASE_DIR, LOGS_DIR_NAME)
     
     # Création du dossier Logs s'il n'existe pas
@@ -59,8 +205,721 @@ def setup_logging():
     if logs_created:
         logger.info(f"Dossier 'Logs' créé : {logs_dir}")
 
-# Initialisation des logs au démarrage
-setup_logging()
+# Logger paresseux : loguru est importé et configuré (setup_logging) au premier message de log
+class _LazyLogger:
+    def __init__(self):
+        self._logger = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._logger is None:
+            with self._lock:
+                if self._logger is None:
+                    from loguru import logger as loguru_logger
+                    setup_logging()
+                    self._logger = loguru_logger
+        return getattr(self._logger, name)
+
+logger = _LazyLogger()
+
+# Métriques du processus : compteurs et histogrammes de durée par étape
+class MetricsRegistry:
+    """
+    Compteurs et histogrammes thread-safe, identifiés par un nom et des étiquettes.
+
+    span(stage) chronomètre un bloc dans l'histogramme stage_duration_seconds.
+    render_prometheus() produit le format texte Prometheus (endpoint /metrics ou
+    fichier pour le textfile collector), summary_lines() le résumé de --stats.
+    """
+
+    def __init__(self, buckets=METRICS_DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}  # (nom, étiquettes) -> valeur
+        self._histograms = {}  # (nom, étiquettes) -> comptes par bucket, somme, nombre, max
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0, "max": 0.0}
+            histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+            histogram["max"] = max(histogram["max"], value)
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_duration_seconds", time.perf_counter() - start, stage=stage)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        # Copie cohérente des valeurs (lecture sans bloquer les threads plus longtemps que nécessaire)
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in self._histograms.items()}
+        return counters, histograms
+
+    def render_prometheus(self):
+        counters, histograms = self.snapshot()
+        samples = {}
+        for (name, labels), value in sorted(counters.items()):
+            samples.setdefault(name, []).append(f"{_prometheus_name(name)}{_prometheus_labels(labels)} {value:g}")
+
+        for (name, labels), h in sorted(histograms.items()):
+            metric = _prometheus_name(name)
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), h["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{metric}_bucket{_prometheus_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {h['sum']:.6f}")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {h['count']}")
+
+        output = []
+        for name in sorted(samples, key=lambda n: (n not in METRICS_DEFINITIONS, n)):
+            kind, description = METRICS_DEFINITIONS.get(name, ("untyped", name))
+            output.append(f"# HELP {_prometheus_name(name)} {description}")
+            output.append(f"# TYPE {_prometheus_name(name)} {kind}")
+            output.extend(samples[name])
+        return "\n".join(output) + "\n" if output else ""
+
+    def summary_lines(self):
+        counters, histograms = self.snapshot()
+        lines = [f"{'Étape':<16}{'nombre':>8}{'total (s)':>12}{'moyenne (ms)':>14}{'max (ms)':>10}"]
+        for (name, labels), h in sorted(histograms.items()):
+            stage = dict(labels).get("stage", name)
+            mean_ms = h["sum"] / h["count"] * 1000 if h["count"] else 0.0
+            lines.append(f"{stage:<16}{h['count']:>8}{h['sum']:>12.3f}{mean_ms:>14.2f}{h['max'] * 1000:>10.2f}")
+
+        grouped = {}
+        for (name, labels), value in sorted(counters.items()):
+            label_text = ",".join(str(v) for _, v in labels)
+            grouped.setdefault(name, []).append(f"{label_text}={value:g}" if label_text else f"{value:g}")
+        for name, values in grouped.items():
+            lines.append(f"{name} : {', '.join(values)}")
+        return lines
+
+def _prometheus_name(name):
+    return f"{METRICS_PREFIX}_{name}"
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    # Échappement Prometheus : antislash, guillemet et retour à la ligne
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+metrics = MetricsRegistry()
+
+# Écriture atomique des métriques au format texte Prometheus (textfile collector de node_exporter)
+def write_metrics_file(path):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(metrics.render_prometheus())
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture du fichier de métriques ({path}) : {e}")
+        return None
+    logger.info(f"Métriques écrites dans le fichier : {path}")
+    return path
+
+# Session HTTP partagée (pool de connexions keep-alive) pour tous les appels API
+_http_session = None
+_http_session_lock = threading.Lock()
+_http_pool_config = {
+    "pool_connections": HTTP_POOL_CONNECTIONS,
+    "pool_maxsize": HTTP_POOL_MAXSIZE,
+    "pool_block": HTTP_POOL_BLOCK,
+}
+
+def configure_http_session(pool_connections=None, pool_maxsize=None, pool_block=None):
+    """
+    Modifie la configuration du pool de connexions HTTP.
+
+    La session existante est fermée, la suivante sera recréée avec les nouveaux paramètres
+    au prochain appel de get_http_session().
+    """
+    global _http_session
+
+    with _http_session_lock:
+        if pool_connections is not None:
+            _http_pool_config["pool_connections"] = pool_connections
+        if pool_maxsize is not None:
+            _http_pool_config["pool_maxsize"] = pool_maxsize
+        if pool_block is not None:
+            _http_pool_config["pool_block"] = pool_block
+
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+    logger.info(f"Configuration du pool HTTP : {_http_pool_config}")
+
+def get_http_session():
+    # Création paresseuse de la session, partagée entre tous les threads
+    global _http_session
+
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=_http_pool_config["pool_connections"],
+                    pool_maxsize=_http_pool_config["pool_maxsize"],
+                    pool_block=_http_pool_config["pool_block"],
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({"Connection": "keep-alive"})
+                _http_session = session
+                logger.info("Session HTTP initialisée (connexions keep-alive réutilisées)")
+
+    return _http_session
+
+def close_http_session():
+    # Fermeture des connexions du pool (fin de programme ou reconfiguration)
+    global _http_session
+
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+            logger.info("Session HTTP fermée")
+
+# Limiteur de débit partagé par tous les appels API (seau à jetons)
+class TokenBucket:
+    """
+    Seau à jetons thread-safe : rate jetons par seconde, au plus capacity en réserve.
+
+    acquire() bloque jusqu'à ce qu'un jeton soit disponible. pause() suspend tous les
+    appelants (réponse 429 avec Retry-After).
+    """
+
+    def __init__(self, calls_per_minute=RATE_LIMIT_CALLS_PER_MINUTE, capacity=RATE_LIMIT_BURST):
+        self.rate = calls_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+_rate_limiter = TokenBucket()
+_retry_config = {"max_retries": API_MAX_RETRIES, "timeout": API_TIMEOUT_SECONDS}
+
+def configure_rate_limit(calls_per_minute=None, burst=None):
+    # Remplace le limiteur partagé (calls_per_minute=0 : pas de limite)
+    global _rate_limiter
+
+    calls_per_minute = _rate_limiter.rate * 60 if calls_per_minute is None else calls_per_minute
+    burst = _rate_limiter.capacity if burst is None else burst
+    _rate_limiter = TokenBucket(calls_per_minute, burst)
+    logger.info(f"Limitation de débit : {calls_per_minute:g} appel(s)/minute, rafale de {burst}")
+
+def configure_retry(max_retries=None, timeout=None):
+    if max_retries is not None:
+        _retry_config["max_retries"] = max_retries
+    if timeout is not None:
+        _retry_config["timeout"] = timeout
+    logger.info(f"Configuration des nouvelles tentatives : {_retry_config}")
+
+def _retry_after_seconds(response):
+    # En-tête Retry-After : nombre de secondes ou date HTTP
+    from email.utils import parsedate_to_datetime
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), API_RETRY_AFTER_MAX_SECONDS)
+
+def _backoff_seconds(attempt):
+    # Backoff exponentiel avec "full jitter" pour désynchroniser les threads
+    return random.uniform(0, min(API_BACKOFF_MAX_SECONDS, API_BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+# Point d'entrée unique pour les requêtes vers l'API OpenWeatherMap
+def api_get(url, timeout=None):
+    """
+    GET via la session partagée, après passage par le limiteur de débit.
+
+    Les codes 429 et 5xx ainsi que les erreurs de connexion/timeout sont retentés avec un
+    backoff exponentiel aléatoire (Retry-After respecté, et appliqué à tous les threads
+    pour un 429). Après la dernière tentative, la réponse (ou l'exception) est renvoyée.
+    """
+    import requests
+
+    timeout = _retry_config["timeout"] if timeout is None else timeout
+    max_retries = _retry_config["max_retries"]
+
+    for attempt in range(max_retries + 1):
+        _rate_limiter.acquire()
+        try:
+            response = get_http_session().get(url, timeout=timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            metrics.inc("api_requests_total", status="network_error")
+            if attempt == max_retries:
+                raise
+            delay = _backoff_seconds(attempt)
+            logger.warning(f"Erreur réseau ({e.__class__.__name__}), nouvelle tentative dans {delay:.1f}s ({attempt + 1}/{max_retries})")
+        else:
+            metrics.inc("api_requests_total", status=str(response.status_code))
+            metrics.inc("api_bytes_downloaded_total", len(response.content))
+            if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                return response
+            retry_after = _retry_after_seconds(response)
+            delay = retry_after if retry_after is not None else _backoff_seconds(attempt)
+            if response.status_code == 429:
+                _rate_limiter.pause(delay)
+            logger.warning(f"Réponse {response.status_code} de l'API, nouvelle tentative dans {delay:.1f}s ({attempt + 1}/{max_retries})")
+
+        metrics.inc("api_retries_total")
+        time.sleep(delay)
+
+# Erreur renvoyée par l'API OpenWeatherMap (code HTTP différent de 200)
+class WeatherAPIError(Exception):
+    def __init__(self, status_code, text=""):
+        super().__init__(f"Erreur API ({status_code}) : {text}")
+        self.status_code = status_code
+        self.text = text
+
+# Erreur réseau (connexion, timeout...) lors d'un appel à l'API
+class WeatherNetworkError(Exception):
+    pass
+
+# URL de l'endpoint forecast (modifiable pour pointer vers un serveur simulé, cf. benchmarks)
+_api_config = {"url": API_FORECAST_URL}
+
+def configure_api_url(url=None):
+    if url:
+        _api_config["url"] = url.rstrip("?")
+        logger.info(f"URL de l'API : {_api_config['url']}")
+
+# Statistiques dérivées et seuils des transitions majeures appliqués à format_forecast (None : sortie par défaut)
+_aggregation_config = {"spec": None}
+
+def configure_aggregation(metrics=None, temp_delta=None, require_weather_change=None):
+    # Lève ValueError si une statistique est inconnue (voir DERIVED_METRICS / register_metric)
+    current = _aggregation_config["spec"] or AggregationSpec()
+    spec = AggregationSpec(
+        current.metrics if metrics is None else metrics,
+        current.temp_delta if temp_delta is None else temp_delta,
+        current.require_weather_change if require_weather_change is None else require_weather_change,
+    )
+    _aggregation_config["spec"] = None if spec.is_default() else spec
+    if not spec.is_default():
+        logger.info(f"Statistiques dérivées : {', '.join(spec.metrics) or 'aucune'} ; transitions : variation > {spec.temp_delta}°C"
+                    f"{' et changement de catégorie météo' if spec.require_weather_change else ''}")
+
+def get_aggregation():
+    return _aggregation_config["spec"]
+
+def parse_metric_names(value):
+    # "temp_min, pop_max" -> ("temp_min", "pop_max")
+    return tuple(name.strip() for name in value.split(",") if name.strip())
+
+# Réglages optionnels de local.conf : DERIVED_METRICS, TRANSITION_TEMP_DELTA, TRANSITION_REQUIRE_WEATHER_CHANGE
+def load_aggregation_settings(config_file=CONFIG_FILE_NAME):
+    settings = {}
+    try:
+        with open(os.path.join(BASE_DIR, config_file), "r") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return settings  # Absence du fichier déjà signalée par load_api_key
+
+    for line in lines:
+        name, _, value = line.partition("=")
+        name = name.strip()
+        value = value.strip()
+        try:
+            if name == "DERIVED_METRICS":
+                settings["metrics"] = parse_metric_names(value)
+            elif name == "TRANSITION_TEMP_DELTA":
+                settings["temp_delta"] = float(value)
+            elif name == "TRANSITION_REQUIRE_WEATHER_CHANGE":
+                if value.lower() not in ("true", "false", "1", "0", "yes", "no"):
+                    raise ValueError(value)
+                settings["require_weather_change"] = value.lower() in ("true", "1", "yes")
+        except ValueError:
+            logger.warning(f"Valeur ignorée dans {config_file} : {line}")
+
+    return settings
+
+def apply_aggregation_settings(overrides=None):
+    # Valeurs par défaut, puis local.conf, puis options de la ligne de commande (valeurs non None)
+    default = AggregationSpec()
+    settings = {"metrics": default.metrics, "temp_delta": default.temp_delta, "require_weather_change": default.require_weather_change}
+    settings.update(load_aggregation_settings())
+    settings.update({name: value for name, value in (overrides or {}).items() if value is not None})
+    configure_aggregation(**settings)
+
+# Désignation d'un lieu sans ambiguïté : identifiant OpenWeatherMap ou coordonnées (paramètres de l'API)
+def location_by_id(city_id):
+    return {"id": int(city_id)}
+
+def location_by_coords(lat, lon):
+    # Arrondi à 4 décimales (~10 m) : des coordonnées voisines partagent la même entrée de cache
+    return {"lat": round(float(lat), COORD_DECIMALS), "lon": round(float(lon), COORD_DECIMALS)}
+
+# Construction de l'URL de prévision pour une ville donnée (location : voir location_by_id / location_by_coords)
+def build_forecast_url(city, country, api_key, units=DEFAULT_UNITS, lang=DEFAULT_LANG, location=None):
+    query = urlencode(location) if location else f"q={city},{country}"
+    return f"{_api_config['url']}?{query}&appid={api_key}&units={units}&lang={lang}"
+
+# Requête à l'API et récupération du JSON raw (sans cache)
+def request_forecast_data(city, country, api_key, units=DEFAULT_UNITS, lang=DEFAULT_LANG, location=None):
+    import requests
+
+    try:
+        with metrics.span("fetch"):
+            response = api_get(build_forecast_url(city, country, api_key, units, lang, location))
+    except requests.exceptions.RequestException as e:
+        metrics.inc("errors_total", type="network")
+        raise WeatherNetworkError(str(e)) from e
+
+    # La réponse de la vraie requête fait foi pour la validité de la clé
+    if response.status_code == 200:
+        record_api_key_status(api_key, True)
+    elif response.status_code == 401:
+        record_api_key_status(api_key, False)
+
+    if response.status_code != 200:
+        metrics.inc("errors_total", type=str(response.status_code))
+        raise WeatherAPIError(response.status_code, response.text)
+
+    with metrics.span("json_decode"):
+        data = response.json()
+    if _archive_config["enabled"]:
+        # Lieu désigné par identifiant ou coordonnées : clé d'archive sur le nom et le pays renvoyés par l'API
+        if location and data.get("city"):
+            city, country = data["city"].get("name") or city, data["city"].get("country") or country
+        append_to_archive(data, city, country)
+    return data
+
+# Cache disque des réponses brutes de l'API, clé (ville, pays, unités, langue)
+_cache_config = {
+    "enabled": True,
+    "ttl": CACHE_TTL_SECONDS,
+    "max_entries": CACHE_MAX_ENTRIES,
+    "stale_while_revalidate": False,
+    "stale_max": CACHE_STALE_MAX_SECONDS,
+}
+_cache_lock = threading.Lock()
+_cache_refreshing = set()
+_cache_entry_count = None  # Nombre d'entrées sur disque, initialisé au premier scan
+
+def configure_cache(enabled=None, ttl=None, max_entries=None, stale_while_revalidate=None, stale_max=None):
+    # Modifie la configuration du cache (seules les valeurs fournies sont changées)
+    updates = {
+        "enabled": enabled,
+        "ttl": ttl,
+        "max_entries": max_entries,
+        "stale_while_revalidate": stale_while_revalidate,
+        "stale_max": stale_max,
+    }
+    for name, value in updates.items():
+        if value is not None:
+            _cache_config[name] = value
+
+    logger.info(f"Configuration du cache : {_cache_config}")
+
+def cache_key(city, country, units=DEFAULT_UNITS, lang=DEFAULT_LANG, location=None):
+    # Clé stable par identifiant ou coordonnées si connus, sinon nom normalisé (casse, espaces)
+    if location:
+        place = ",".join(f"{name}={value}" for name, value in sorted(location.items()))
+        return "|".join((place, units, lang))
+    return "|".join(part.strip().lower() for part in (city, country, units, lang))
+
+def _cache_path(key):
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(BASE_DIR, CACHE_DIR_NAME, f"{digest}{JSON_EXTENSION}")
+
+def read_cache_entry(key):
+    """
+    Lit une réponse en cache. Retourne (data, âge en secondes) ou None.
+
+    La date de modification du fichier sert de date de dernier accès pour l'éviction LRU.
+    """
+    path = _cache_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Entrée de cache illisible ignorée ({path}) : {e}")
+        return None
+
+    if entry.get("key") != key:
+        return None
+
+    return entry["data"], time.time() - entry["fetched_at"]
+
+def read_cache_age(key):
+    """
+    Âge en secondes d'une entrée de cache, ou None si absente.
+
+    Seul le début du fichier est lu (clé et fetched_at sont écrits avant data) et la date
+    d'accès n'est pas modifiée : l'ordre d'éviction LRU reste inchangé.
+    """
+    path = _cache_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            head = f.read(CACHE_HEADER_READ_SIZE)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Entrée de cache illisible ignorée ({path}) : {e}")
+        return None
+
+    prefix = '{"key":' + json.dumps(key, ensure_ascii=False) + ',"fetched_at":'
+    if not head.startswith(prefix):
+        return None
+    try:
+        fetched_at, _ = json.JSONDecoder().raw_decode(head, len(prefix))
+    except ValueError:
+        return None
+    return time.time() - fetched_at
+
+def write_cache_entry(key, data):
+    cache_dir = os.path.join(BASE_DIR, CACHE_DIR_NAME)
+    path = _cache_path(key)
+    # Processus et thread dans le nom : batch, watch, serve et les processus de reprocess partagent le dossier Cache
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    global _cache_entry_count
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        is_new = not os.path.exists(path)
+        # Écriture atomique : un lecteur concurrent ne voit jamais de fichier partiel
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "fetched_at": time.time(), "data": data}, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture du cache ({path}) : {e}")
+        return
+
+    # Le répertoire n'est parcouru que lorsque la limite risque d'être dépassée
+    with _cache_lock:
+        if _cache_entry_count is not None and is_new:
+            _cache_entry_count += 1
+        needs_scan = _cache_entry_count is None or _cache_entry_count > _cache_config["max_entries"]
+
+    if needs_scan:
+        evict_cache_entries()
+
+def evict_cache_entries(max_entries=None):
+    # Suppression des entrées les moins récemment utilisées au-delà de la taille maximale
+    global _cache_entry_count
+
+    max_entries = _cache_config["max_entries"] if max_entries is None else max_entries
+    cache_dir = os.path.join(BASE_DIR, CACHE_DIR_NAME)
+
+    with _cache_lock:
+        try:
+            entries = [e for e in os.scandir(cache_dir) if e.name.endswith(JSON_EXTENSION)]
+        except FileNotFoundError:
+            _cache_entry_count = 0
+            return 0
+
+        surplus = len(entries) - max_entries
+        _cache_entry_count = len(entries)
+        if surplus <= 0:
+            return 0
+
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        removed = 0
+        for entry in entries[:surplus]:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+        _cache_entry_count -= removed
+
+    logger.info(f"Cache : {removed} entrée(s) évincée(s) (limite {max_entries})")
+    return removed
+
+def clear_cache():
+    cache_dir = os.path.join(BASE_DIR, CACHE_DIR_NAME)
+    removed = evict_cache_entries(max_entries=0) if os.path.isdir(cache_dir) else 0
+    logger.info(f"Cache vidé ({removed} entrée(s))")
+    return removed
+
+# État incrémental de chaque ville (un fichier JSON par ville dans le dossier State)
+def _state_path(key):
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(BASE_DIR, STATE_DIR_NAME, f"{digest}{JSON_EXTENSION}")
+
+def load_forecast_state(key):
+    path = _state_path(key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"État incrémental illisible ignoré ({path}) : {e}")
+        return None
+
+    return entry["state"] if entry.get("key") == key else None
+
+def save_forecast_state(key, state):
+    path = _state_path(key)
+    # Processus et thread dans le nom : plusieurs processus peuvent mettre à jour le dossier State
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "state": state}, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'écriture de l'état incrémental ({path}) : {e}")
+
+# Mode incrémental : fusion du JSON raw dans l'état de la ville, retourne le delta
+def update_forecast_state(city, country, data, fetched_at=None, location=None):
+    """
+    Fusionne data dans l'état mémorisé de (ville, pays) et retourne le delta.
+
+    Le delta a la structure de format_forecast, mais forecast_details ne contient que
+    les jours dont les agrégats ont changé depuis l'appel précédent (liste vide si rien
+    n'a changé). La vue complète reste disponible via format_forecast_state.
+    """
+    key = cache_key(city, country, location=location)
+    state = load_forecast_state(key) or new_forecast_state(data["city"])
+
+    with metrics.span("merge"):
+        changed_days, changed_slots = merge_forecast(
+            state, data["city"], data["list"], fetched_at=fetched_at or time.time(), keep_days=INCREMENTAL_KEEP_DAYS,
+            aggregation=get_aggregation(),
+        )
+    save_forecast_state(key, state)
+
+    logger.info(f"Mode incrémental pour {city}, {country} : {changed_slots} créneau(x) modifié(s), {len(changed_days)} jour(s) modifié(s)")
+    return {
+        "forecast_location_name": data["city"]["name"],
+        "country_code": data["city"]["country"],
+        "incremental": True,
+        "changed_slots": changed_slots,
+        "forecast_details": changed_days,
+    }
+
+def _refresh_cache_entry(key, city, country, api_key, units, lang, location):
+    # Rafraîchissement en arrière-plan d'une entrée périmée (stale-while-revalidate)
+    try:
+        data = request_forecast_data(city, country, api_key, units, lang, location)
+        write_cache_entry(key, data)
+        logger.info(f"Cache rafraîchi en arrière-plan pour {city}, {country}")
+    except Exception as e:
+        logger.error(f"Échec du rafraîchissement en arrière-plan pour {city}, {country} : {e}")
+    finally:
+        with _cache_lock:
+            _cache_refreshing.discard(key)
+
+def _start_background_refresh(key, city, country, api_key, units, lang, location):
+    with _cache_lock:
+        if key in _cache_refreshing:
+            return
+        _cache_refreshing.add(key)
+
+    # Thread non daemon : le programme attend la fin du rafraîchissement avant de quitter
+    thread = threading.Thread(
+        target=_refresh_cache_entry,
+        args=(key, city, country, api_key, units, lang, location),
+        name=f"cache-refresh-{city}",
+    )
+    thread.start()
+
+# Récupération du JSON raw, depuis le cache si possible, sinon via l'API
+def fetch_forecast_data(city, country, api_key, use_cache=True, refresh=False, units=DEFAULT_UNITS, lang=DEFAULT_LANG, location=None):
+    """
+    Retourne le JSON raw des prévisions pour (ville, pays).
+
+    - use_cache=False : ni lecture ni écriture du cache (--no-cache)
+    - refresh=True : ignore le cache en lecture mais le met à jour (--refresh)
+    - location : identifiant ou coordonnées (location_by_id, location_by_coords) utilisés
+      à la place du nom pour la requête et la clé de cache
+
+    Lève WeatherAPIError si l'API répond avec un code différent de 200,
+    WeatherNetworkError en cas d'erreur réseau.
+    """
+    use_cache = use_cache and _cache_config["enabled"]
+    key = cache_key(city, country, units, lang, location)
+
+    if use_cache and not refresh:
+        cached = read_cache_entry(key)
+        if cached is not None:
+            data, age = cached
+            if age <= _cache_config["ttl"]:
+                metrics.inc("cache_lookups_total", result="hit")
+                logger.info(f"Réponse servie depuis le cache pour {city}, {country} (âge {age:.0f}s)")
+                return data
+            if _cache_config["stale_while_revalidate"] and age <= _cache_config["stale_max"]:
+                metrics.inc("cache_lookups_total", result="stale")
+                logger.info(f"Réponse périmée servie depuis le cache pour {city}, {country} (âge {age:.0f}s), rafraîchissement en cours")
+                _start_background_refresh(key, city, country, api_key, units, lang, location)
+                return data
+        metrics.inc("cache_lookups_total", result="miss")
+
+    data = request_forecast_data(city, country, api_key, units, lang, location)
+    if use_cache:
+        write_cache_entry(key, data)
+    return data
 
 # Vérification de la clé API + fichier de configuration
 def load_api_key(config_file=CONFIG_FILE_NAME):
@@ -89,23 +948,106 @@ def load_api_key(config_file=CONFIG_FILE_NAME):
     return None  
     # Si aucune ligne API_KEY n'est trouvée
 
+# État de vérification des clés API, mémorisé sur disque avec expiration
+_api_key_state = None
+_api_key_state_lock = threading.Lock()
+
+def _api_key_fingerprint(api_key):
+    # Seule l'empreinte de la clé est stockée, jamais la clé elle-même
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+def _load_api_key_state():
+    global _api_key_state
+
+    if _api_key_state is None:
+        path = os.path.join(BASE_DIR, API_KEY_STATE_FILE_NAME)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _api_key_state = json.load(f)
+        except FileNotFoundError:
+            _api_key_state = {}
+        except Exception as e:
+            logger.warning(f"Fichier d'état des clés API illisible, ignoré ({path}) : {e}")
+            _api_key_state = {}
+
+    return _api_key_state
+
+def read_api_key_status(api_key):
+    """
+    Retourne le dernier résultat de vérification connu pour la clé API.
+
+    True (valide), False (invalide) ou None si inconnu ou expiré.
+    """
+    with _api_key_state_lock:
+        entry = _load_api_key_state().get(_api_key_fingerprint(api_key))
+
+    if entry is None:
+        return None
+
+    ttl = API_KEY_STATE_TTL_SECONDS if entry["valid"] else API_KEY_INVALID_STATE_TTL_SECONDS
+    if time.time() - entry["verified_at"] > ttl:
+        return None
+    return entry["valid"]
+
+def record_api_key_status(api_key, valid):
+    # Mémorisation du résultat (écriture disque uniquement si l'état change ou expire bientôt)
+    fingerprint = _api_key_fingerprint(api_key)
+    now = time.time()
+
+    with _api_key_state_lock:
+        state = _load_api_key_state()
+        entry = state.get(fingerprint)
+        # Durée de validité propre au résultat (15 min pour une clé invalide, 24 h pour une clé valide)
+        ttl = API_KEY_STATE_TTL_SECONDS if valid else API_KEY_INVALID_STATE_TTL_SECONDS
+        if entry is not None and entry["valid"] == valid and now - entry["verified_at"] < ttl / 2:
+            return
+
+        state[fingerprint] = {"valid": valid, "verified_at": now}
+        path = os.path.join(BASE_DIR, API_KEY_STATE_FILE_NAME)
+        # Fichier temporaire propre au processus et au thread : pas de collision entre exécutions simultanées
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture de l'état des clés API ({path}) : {e}")
+            return
+
+    logger.info(f"État de la clé API mémorisé : {'valide' if valid else 'invalide'}")
+
 # Vérification du fonctionnement de la clé API
-def verify_api_key(api_key, quiet=False): 
+def verify_api_key(api_key, quiet=False, use_cache=True): 
     if not api_key:
         logger.warning("Tentative de vérification avec une clé API vide")
         return False
+
+    # Résultat déjà connu et non expiré : pas de requête de test
+    if use_cache:
+        status = read_api_key_status(api_key)
+        if status is not None:
+            logger.info(f"Vérification de la clé API depuis l'état mémorisé ({'valide' if status else 'invalide'})")
+            if not status and not quiet:
+                print("Erreur : La clé API ne fonctionne pas (clé invalide ou expirée lors de la dernière vérification)")
+            return status
     
+    import requests
+
     # Requête test avec une ville témoin (Toulouse)
-    test_url = f"http://api.openweathermap.org/data/2.5/forecast?q=Toulouse,FR&appid={api_key}&units=metric"
+    test_url = f"{_api_config['url']}?q=Toulouse,FR&appid={api_key}&units=metric"
     logger.info("Début de la vérification de la clé API")
     
     try:
-        response = requests.get(test_url, timeout=10)
+        with metrics.span("verify_api_key"):
+            response = api_get(test_url)
         if response.status_code == 200:
             logger.success("Clé API vérifiée avec succès (code 200)")
+            record_api_key_status(api_key, True)
             return True
         else:
             logger.error(f"Échec de la vérification de la clé API (code {response.status_code})")
+            if response.status_code == 401:
+                record_api_key_status(api_key, False)
             if not quiet:
                 print(f"Erreur : La clé API ne fonctionne pas (code {response.status_code})")
                 if 500 <= response.status_code <= 599:
@@ -124,226 +1066,729 @@ def verify_api_key(api_key, quiet=False):
             print(f"Erreur lors de la vérification de la clé API : {e}")
         return False
 
-# Calcul des transitions majeures basé sur list.weather.main
-def calcul_major_transitions(entries):
+# Sauvegarde du résultat JSON dans un fichier
+def save_to_file(data, filename=None, city=None, country=None, suffix=""):
+    
+    # Création du dossier JSON Output s'il n'existe pas
+    output_dir = os.path.join(BASE_DIR, JSON_OUTPUT_DIR_NAME)
+    if not os.path.exists(output_dir):
+        try:
+            os.makedirs(output_dir)
+            logger.info(f"Dossier '{JSON_OUTPUT_DIR_NAME}' créé : {output_dir}")
+        except Exception as e:
+            logger.error(f"Erreur lors de la création du dossier '{JSON_OUTPUT_DIR_NAME}' : {e}")
+            return None
+    
+    # Sauvegarde les données JSON formatées dans un fichier. Si le nom de fichier n'est pas fourni, on génère un nom automatique.
+    generated = filename is None
+    if generated:
+        city_name = data.get("forecast_location_name", DEFAULT_CITY_NAME)
+        country_code = data.get("country_code", "")
+        timestamp = datetime.now().strftime(FILE_TIMESTAMP_FORMAT)
+        filename = f"{city_name}_{country_code}_{timestamp}{suffix}{JSON_EXTENSION}"
+    
+    # S'assurer que le fichier a l'extension .json
+    if not filename.endswith(JSON_EXTENSION):
+        filename += JSON_EXTENSION
+    
+    # Chemin complet du fichier dans le dossier JSON Output
+    complete_path = os.path.join(output_dir, filename)
+    
+    # Nom généré : création exclusive, suffixe _2, _3... si le fichier existe déjà
+    # (même ville écrite deux fois dans la même seconde, homonymes d'un batch)
+    attempt = 1
+    while True:
+        try:
+            logger.info(f"Écriture du fichier JSON : {complete_path}")
+            with open(complete_path, "x" if generated else "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            logger.success(f"Fichier JSON écrit avec succès : {complete_path}")
+            return complete_path
+        except FileExistsError:
+            attempt += 1
+            complete_path = os.path.join(output_dir, f"{filename[:-len(JSON_EXTENSION)]}_{attempt}{JSON_EXTENSION}")
+        except Exception as e:
+            logger.error(f"Erreur lors de l'écriture du fichier JSON : {e}")
+            return None
+
+# Sérialiseur JSON compact (bytes) : orjson si disponible, sinon le module json standard
+def get_json_serializer(backend="auto"):
+    if backend in ("auto", "orjson"):
+        try:
+            import orjson
+            return orjson.dumps
+        except ImportError:
+            if backend == "orjson":
+                raise
+            logger.info("orjson non installé : sérialisation avec le module json standard")
+
+    def dumps(data):
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    return dumps
+
+# Écriture groupée des résultats d'un batch dans un seul fichier JSON Lines (optionnellement gzip)
+class BatchOutputWriter:
+    """
+    Un résultat par ligne, encodage compact, écriture bufferisée et thread-safe.
+
+    Le fichier est écrit sous un nom temporaire (.part) puis renommé atomiquement à la
+    fermeture : un lecteur ne voit jamais de fichier incomplet. append=True reprend un
+    fichier .part existant (reprise après interruption).
+    """
+
+    def __init__(self, path=None, compress=False, backend="auto", append=False):
+        if path is None:
+            timestamp = datetime.now().strftime(FILE_TIMESTAMP_FORMAT)
+            extension = JSONL_EXTENSION + (GZIP_EXTENSION if compress else "")
+            path = os.path.join(BASE_DIR, JSON_OUTPUT_DIR_NAME, f"{BATCH_FILE_PREFIX}{timestamp}{extension}")
+
+        self.path = path
+        self.partial_path = path + PARTIAL_EXTENSION
+        self.count = 0
+        self._serialize = get_json_serializer(backend)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        mode = "ab" if append else "wb"
+        raw = open(self.partial_path, mode, buffering=OUTPUT_BUFFER_SIZE)
+        self._file = gzip.GzipFile(fileobj=raw, mode=mode) if compress else raw
+        self._raw = raw
+        logger.info(f"Écriture groupée ouverte : {self.partial_path}")
+
+    def write(self, data):
+        line = self._serialize(data) + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self.count += 1
+
+    def write_lines(self, lines):
+        # Lignes déjà sérialisées (bytes terminés par \n), par exemple par des processus de retraitement
+        with self._lock:
+            self._file.write(b"".join(lines))
+            self.count += len(lines)
+
+    def checkpoint(self):
+        """
+        Rend tout ce qui a été écrit durable et retourne la taille du fichier .part.
+
+        En gzip, le membre courant est terminé et un nouveau commence : tronquer le fichier
+        à cette taille donne toujours un fichier valide (reprise après interruption).
+        """
+        with self._lock:
+            compressed = self._file is not self._raw
+            if compressed:
+                self._file.close()
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+            offset = self._raw.tell()
+            # L'en-tête du membre suivant est écrit après la position retournée
+            if compressed:
+                self._file = gzip.GzipFile(fileobj=self._raw, mode="ab")
+            return offset
+
+    def flush(self):
+        # Vidage des buffers jusqu'au disque (points de reprise)
+        with self._lock:
+            self._file.flush()
+            if self._file is not self._raw:
+                self._raw.flush()
+            os.fsync(self._raw.fileno())
+
+    def close(self, finalize=True):
+        with self._lock:
+            self._file.close()
+            if self._file is not self._raw:
+                self._raw.close()
+
+        if not finalize:
+            logger.warning(f"Écriture groupée interrompue, fichier partiel conservé : {self.partial_path}")
+            return None
+
+        os.replace(self.partial_path, self.path)
+        logger.success(f"Fichier JSON Lines écrit avec succès : {self.path} ({self.count} résultat(s))")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(finalize=exc_type is None)
+        return False
+
+# Rétention du dossier JSON Output (comme la rétention des logs loguru)
+def cleanup_output_dir(retention_days=None, max_files=None):
+    """
+    Supprime les fichiers de JSON Output plus vieux que retention_days et ne garde que
+    les max_files plus récents. Les fichiers .part en cours d'écriture sont conservés.
+    """
+    output_dir = os.path.join(BASE_DIR, JSON_OUTPUT_DIR_NAME)
+    if not os.path.isdir(output_dir) or (retention_days is None and max_files is None):
+        return 0
+
+    files = [e for e in os.scandir(output_dir) if e.is_file() and not e.name.endswith(PARTIAL_EXTENSION)]
+    files.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+
+    expired = []
+    if max_files is not None:
+        expired.extend(files[max_files:])
+        files = files[:max_files]
+    if retention_days is not None:
+        limit = time.time() - retention_days * SECONDS_PER_DAY
+        expired.extend(e for e in files if e.stat().st_mtime < limit)
+
+    removed = 0
+    for entry in expired:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError as e:
+            logger.error(f"Erreur lors de la suppression de {entry.path} : {e}")
+
+    if removed:
+        logger.info(f"Rétention de '{JSON_OUTPUT_DIR_NAME}' : {removed} fichier(s) supprimé(s)")
+    return removed
+
+# Archive des JSON raw : enregistrements compressés ajoutés à la suite dans un seul fichier
+_archive_config = {"enabled": False, "path": None}
+_archive_lock = threading.Lock()
+_archive_checked = set()
+
+def configure_archive(enabled=None, path=None):
+    # Active l'archivage de chaque JSON raw récupéré depuis l'API (option --archive)
+    if enabled is not None:
+        _archive_config["enabled"] = enabled
+    if path is not None:
+        _archive_config["path"] = path
+    logger.info(f"Configuration de l'archive : {_archive_config}")
+
+def get_archive_path(path=None):
+    path = path or _archive_config["path"]
+    return path or os.path.join(BASE_DIR, ARCHIVE_DIR_NAME, ARCHIVE_FILE_NAME)
+
+def archive_key(city, country):
+    return f"{city.strip().lower()}|{country.strip().lower()}"
+
+def append_to_archive(data, city, country, fetched_at=None, path=None):
+    """
+    Ajoute un JSON raw à la fin de l'archive. Retourne le chemin de l'archive ou None.
+
+    Chaque enregistrement est écrit en un seul appel pour qu'une interruption ne laisse
+    au pire qu'un dernier enregistrement tronqué, supprimé avant le premier ajout suivant.
+    """
+    path = get_archive_path(path)
+    key = archive_key(city, country).encode("utf-8")
+    fetched_at = time.time() if fetched_at is None else fetched_at
+
+    payload = zlib.compress(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), ARCHIVE_COMPRESSION_LEVEL)
+    header = ARCHIVE_HEADER.pack(ARCHIVE_RECORD_MAGIC, len(payload), zlib.crc32(payload), fetched_at, len(key))
+
+    try:
+        with _archive_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if path not in _archive_checked:
+                repair_archive_tail(path)
+                _archive_checked.add(path)
+            with open(path, "ab") as f:
+                f.write(header + key + payload)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'archivage du JSON raw ({path}) : {e}")
+        return None
+
+    return path
+
+def scan_archive(archive):
+    """
+    Parcourt les en-têtes d'une archive (bytes ou mmap) sans décompresser les JSON.
+
+    Génère des tuples (clé, date de récupération, début du JSON compressé, taille, CRC32).
+    """
+    offset = 0
+    size = len(archive)
+
+    while offset + ARCHIVE_HEADER.size <= size:
+        magic, payload_size, crc, fetched_at, key_size = ARCHIVE_HEADER.unpack_from(archive, offset)
+        if magic != ARCHIVE_RECORD_MAGIC:
+            logger.error(f"Archive corrompue à l'offset {offset} (en-tête invalide), lecture arrêtée")
+            return
+
+        key_start = offset + ARCHIVE_HEADER.size
+        payload_start = key_start + key_size
+        offset = payload_start + payload_size
+        if offset > size:
+            logger.warning(f"Dernier enregistrement de l'archive tronqué (offset {key_start - ARCHIVE_HEADER.size}), ignoré")
+            return
+
+        yield bytes(archive[key_start:payload_start]).decode("utf-8"), fetched_at, payload_start, payload_size, crc
+
+def find_partial_tail(archive):
+    # Offset du dernier enregistrement incomplet (interruption pendant l'écriture), None si la fin de l'archive est saine
+    offset = 0
+    size = len(archive)
+
+    while offset < size:
+        if offset + ARCHIVE_HEADER.size > size:
+            return offset
+        magic, payload_size, _, _, key_size = ARCHIVE_HEADER.unpack_from(archive, offset)
+        if magic != ARCHIVE_RECORD_MAGIC:
+            # Corruption au milieu de l'archive : rien n'est supprimé
+            return None
+        next_offset = offset + ARCHIVE_HEADER.size + key_size + payload_size
+        if next_offset > size:
+            return offset
+        offset = next_offset
+
+    return None
+
+def repair_archive_tail(path):
+    # Tronque un dernier enregistrement incomplet pour que les ajouts suivants restent lisibles
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as archive:
+        offset = find_partial_tail(archive)
+
+    if offset is not None:
+        logger.warning(f"Dernier enregistrement de l'archive tronqué (offset {offset}), supprimé avant l'ajout")
+        with open(path, "r+b") as f:
+            f.truncate(offset)
+
+def iter_archive(cities=None, since=None, until=None, path=None):
+    """
+    Lit l'archive via mmap et génère (clé, date de récupération, JSON raw).
+
+    Seuls les enregistrements sélectionnés sont décompressés :
+    - cities : liste de tuples (ville, pays), toutes les villes si None
+    - since / until : bornes (timestamps epoch) sur la date de récupération
+    """
+    path = get_archive_path(path)
+    keys = {archive_key(city, country) for city, country in cities} if cities else None
+
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        logger.warning(f"Archive introuvable ou vide : {path}")
+        return
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as archive:
+        for key, fetched_at, start, payload_size, crc in scan_archive(archive):
+            if keys is not None and key not in keys:
+                continue
+            if (since is not None and fetched_at < since) or (until is not None and fetched_at > until):
+                continue
+
+            payload = archive[start:start + payload_size]
+            if zlib.crc32(payload) != crc:
+                logger.error(f"Enregistrement corrompu ignoré ({key}, offset {start})")
+                continue
+
+            yield key, fetched_at, json.loads(zlib.decompress(payload))
+
+def replay_archive(cities=None, since=None, until=None, path=None):
+    # Rejoue les JSON raw archivés dans format_forecast, un enregistrement à la fois
+    for key, fetched_at, data in iter_archive(cities, since, until, path):
+        yield key, fetched_at, format_forecast(data, get_aggregation())
+
+# Index local des villes : nom -> identifiant OpenWeatherMap et coordonnées, sans appel à l'API
+def normalize_city_name(name):
+    # Minuscules, sans accents ni espaces superflus : "  Besançon " -> "besancon"
+    import unicodedata
+
+    decomposed = unicodedata.normalize("NFKD", name)
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).lower().split())
+
+class CityIndex:
+    """
+    Index des villes lu via mmap (rien n'est chargé en mémoire à l'ouverture).
+
+    Les enregistrements sont triés par nom normalisé (puis pays et identifiant) : la
+    recherche exacte (lookup) et par préfixe (search) se font par bisection sur la table
+    des offsets. within() parcourt tout l'index (sélection par zone géographique).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count = CITY_INDEX_HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error) as e:
+            self._file.close()
+            raise ValueError(f"Index des villes illisible : {path}") from e
+        if magic != CITY_INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"Index des villes invalide (en-tête) : {path}")
+
+    def __len__(self):
+        return self.count
+
+    def _offset(self, position):
+        return CITY_INDEX_OFFSET.unpack_from(self._map, CITY_INDEX_HEADER.size + position * CITY_INDEX_OFFSET.size)[0]
+
+    def _key(self, position):
+        offset = self._offset(position)
+        key_size = self._map[offset + CITY_INDEX_RECORD.size - 2]
+        start = offset + CITY_INDEX_RECORD.size
+        return self._map[start:start + key_size]
+
+    def record(self, position):
+        offset = self._offset(position)
+        city_id, lat, lon, country, key_size, name_size = CITY_INDEX_RECORD.unpack_from(self._map, offset)
+        start = offset + CITY_INDEX_RECORD.size + key_size
+        return {
+            "id": city_id,
+            "name": self._map[start:start + name_size].decode("utf-8", errors="ignore"),
+            "country": country.rstrip(b"\0").decode("ascii"),
+            "lat": round(lat, COORD_DECIMALS),
+            "lon": round(lon, COORD_DECIMALS),
+        }
+
+    def _bisect(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, prefix, country=None, limit=CITY_SEARCH_LIMIT):
+        # Villes dont le nom normalisé commence par prefix (ordre alphabétique)
+        key = normalize_city_name(prefix).encode("utf-8")
+        country = country.strip().upper() if country else None
+        results = []
+        position = self._bisect(key)
+        while position < self.count and len(results) < limit and self._key(position).startswith(key):
+            record = self.record(position)
+            if country is None or record["country"] == country:
+                results.append(record)
+            position += 1
+        return results
+
+    def lookup(self, city, country=None):
+        # Villes portant exactement ce nom (après normalisation), dans l'ordre de l'index : pays puis identifiant
+        key = normalize_city_name(city).encode("utf-8")
+        country = country.strip().upper() if country else None
+        results = []
+        position = self._bisect(key)
+        while position < self.count and self._key(position) == key:
+            record = self.record(position)
+            if country is None or record["country"] == country:
+                results.append(record)
+            position += 1
+        return results
+
+    def within(self, lon_min, lat_min, lon_max, lat_max):
+        # Villes dont les coordonnées sont dans la zone (ordre de l'index)
+        for position in range(self.count):
+            _, lat, lon = CITY_INDEX_RECORD.unpack_from(self._map, self._offset(position))[:3]
+            if lon_min <= lon <= lon_max and lat_min <= lat <= lat_max:
+                yield self.record(position)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+_city_index_config = {"enabled": True, "path": None}
+_city_index = None
+_city_index_lock = threading.Lock()
+
+def configure_city_index(enabled=None, path=None):
+    # Résolution locale des noms de villes (activée si l'index existe)
+    global _city_index
+
+    if enabled is not None:
+        _city_index_config["enabled"] = enabled
+    if path is not None:
+        _city_index_config["path"] = path
+    with _city_index_lock:
+        if _city_index is not None:
+            _city_index.close()
+        _city_index = None
+
+def get_city_index_path(path=None):
+    return path or _city_index_config["path"] or os.path.join(BASE_DIR, CITY_INDEX_FILE_NAME)
+
+def get_city_index():
+    # Index ouvert une seule fois ; None s'il est désactivé, absent ou illisible
+    global _city_index
+
+    if not _city_index_config["enabled"]:
+        return None
+    with _city_index_lock:
+        if _city_index is None:
+            path = get_city_index_path()
+            if not os.path.exists(path):
+                return None
+            try:
+                _city_index = CityIndex(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Index des villes ignoré : {e}")
+                _city_index_config["enabled"] = False
+                return None
+            logger.info(f"Index des villes chargé : {path} ({len(_city_index)} villes)")
+        return _city_index
+
+def build_city_index(source, path=None):
     """
-    Calcule le nombre de transitions majeures dans une journée via entries.
+    Construit l'index à partir de la liste des villes OpenWeatherMap (city.list.json, .gz accepté).
 
-    La structure est la suivante:
-    [
-        {
-            "temp": 20.0,
-            "weather": "Rain"
-        },
-        {
-            "temp": 21.0,
-            "weather": "Snow"
-        }
+    Écriture atomique (fichier temporaire puis renommage). Retourne (chemin, nombre de villes).
+    """
+    path = get_city_index_path(path)
+    opener = gzip.open if source.endswith(GZIP_EXTENSION) else open
+    with opener(source, "rt", encoding="utf-8") as f:
+        cities = json.load(f)
+
+    records = []
+    for city in cities:
+        name = (city.get("name") or "").strip()
+        coord = city.get("coord") or {}
+        if not name or "id" not in city or "lat" not in coord or "lon" not in coord:
+            continue
+        key = normalize_city_name(name).encode("utf-8")[:255]
+        country = (city.get("country") or "")[:2].upper()
+        records.append((key, country, int(city["id"]), coord["lat"], coord["lon"], name.encode("utf-8")[:255]))
+    records.sort(key=lambda r: (r[0], r[1], r[2]))
+
+    tmp_path = f"{path}.tmp"
+    offset = CITY_INDEX_HEADER.size + CITY_INDEX_OFFSET.size * len(records)
+    with open(tmp_path, "wb") as f:
+        f.write(CITY_INDEX_HEADER.pack(CITY_INDEX_MAGIC, len(records)))
+        for key, _, _, _, _, name in records:
+            f.write(CITY_INDEX_OFFSET.pack(offset))
+            offset += CITY_INDEX_RECORD.size + len(key) + len(name)
+        for key, country, city_id, lat, lon, name in records:
+            f.write(CITY_INDEX_RECORD.pack(city_id, lat, lon, country.encode("ascii", errors="ignore"), len(key), len(name)))
+            f.write(key + name)
+    os.replace(tmp_path, path)
+
+    configure_city_index()  # Un index déjà ouvert est rechargé à la prochaine utilisation
+    logger.info(f"Index des villes construit : {path} ({len(records)} villes depuis {source})")
+    return path, len(records)
+
+# Résolution locale d'un nom "ville, pays" en identifiant OpenWeatherMap (None : requête par nom)
+def resolve_location(city, country):
+    index = get_city_index()
+    if index is None:
+        return None
+
+    matches = index.lookup(city, country)
+    if not matches:
+        logger.info(f"{city}, {country} absent de l'index des villes, requête par nom")
+        return None
+    # Nom ambigu (pays absent ou homonymes dans le pays) : aucun identifiant deviné, la résolution reste à l'API
+    if len(matches) > 1:
+        logger.warning(f"{len(matches)} villes '{city}, {country}' dans l'index, requête par nom (préciser --city-id)")
+        return None
+    return location_by_id(matches[0]["id"])
+
+# Retraitement en masse : JSON raw d'un dossier (.json, .json.gz) ou de l'archive, répartis sur des processus
+def _iter_raw_files(directory):
+    # Ordre stable (tri par dossier) : les numéros de tâches restent identiques d'une exécution à l'autre
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(JSON_EXTENSION) or name.endswith(JSON_EXTENSION + GZIP_EXTENSION):
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+def _iter_archive_records(path):
+    # En-têtes seulement : la décompression est faite par les processus
+    if os.path.getsize(path) == 0:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as archive:
+        yield from scan_archive(archive)
 
-        etc....
-    ]
+def _reprocess_chunk(kind, source, items, backend, aggregation=None):
     """
-    major_transitions = 0
+    Exécuté dans un processus du pool : lecture, décodage, format_forecast et sérialisation.
 
-    # On compare chaque entrée avec la précédente
-    for i in range(1, len(entries)):
-        prev = entries[i - 1]
-        curr = entries[i]
+    aggregation (AggregationSpec) est transmis explicitement : la configuration du
+    processus principal n'est pas partagée avec les processus du pool.
 
-        # Comparaison de list.weather.main entre deux échantillons consécutifs
-        weather_main_changed = (prev["weather"] != curr["weather"])
-        temp_change = abs(prev["temp"] - curr["temp"])
+    Retourne (lignes JSON Lines en bytes, liste des (élément, erreur)). Aucun log ici :
+    les erreurs sont remontées au processus principal.
+    """
+    serialize = get_json_serializer(backend)
+    lines = []
+    errors = []
 
-        # Transition majeure si list.weather.main change ET variation temp > 3°C
-        if weather_main_changed and temp_change > 3:
-            major_transitions += 1
+    if kind == "archive":
+        with open(source, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as archive:
+            for key, fetched_at, start, payload_size, crc in items:
+                try:
+                    payload = archive[start:start + payload_size]
+                    if zlib.crc32(payload) != crc:
+                        raise ValueError("CRC32 invalide")
+                    formatted = format_forecast(json.loads(zlib.decompress(payload)), aggregation)
+                    lines.append(serialize({"source": key, "fetched_at": fetched_at, **formatted}) + b"\n")
+                except Exception as e:
+                    errors.append((f"{key}@{start}", str(e)))
+    else:
+        for relative_path in items:
+            try:
+                path = os.path.join(source, relative_path)
+                opener = gzip.open if path.endswith(GZIP_EXTENSION) else open
+                with opener(path, "rb") as f:
+                    formatted = format_forecast(json.load(f), aggregation)
+                lines.append(serialize({"source": relative_path, **formatted}) + b"\n")
+            except Exception as e:
+                errors.append((relative_path, str(e)))
 
-    return major_transitions
+    return lines, errors
 
-# Transformation et mise en forme du résultat JSON
-def format_forecast(data):
+def _load_checkpoint(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
 
-    # Récupération basique des infos de la ville
-    city_info = data["city"]
-    forecast_list = data["list"]
+def _save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
 
-    # Structure demandée
-    result = {}
-    result["forecast_location_name"] = city_info["name"]
-    result["country_code"] = city_info["country"]
-    result["total_rain_period_mm"] = 0.0
-    result["total_snow_period_mm"] = 0.0
-    result["max_humidity_period"] = 0
-    result["forecast_details"] = []
+def _chunk_fingerprint(chunk):
+    # Empreinte du contenu d'une tâche (chemins ou en-têtes d'archive) : détecte un décalage des tâches à la reprise
+    return hashlib.sha1(json.dumps(chunk, separators=(",", ":")).encode("utf-8")).hexdigest()
 
-    # On va regrouper dans ce dictionaire les jours
-    days = {}
+def _iter_reprocess_chunks(kind, source, chunk_size):
+    from itertools import islice
 
-    # Puis parcourir toutes les entrées 3h 
-    for entry in forecast_list:
+    items = _iter_archive_records(source) if kind == "archive" else _iter_raw_files(source)
+    return enumerate(iter(lambda: list(islice(items, chunk_size)), []))
 
-        dt_txt = entry["dt_txt"]
-        timestamp = datetime.strptime(dt_txt, DATETIME_FORMAT)
-        date_str = timestamp.strftime(DATE_FORMAT)
+def reprocess_output_path(compress=False):
+    # Fichier produit par défaut : JSON Output/reprocess_<date>.jsonl(.gz)
+    timestamp = datetime.now().strftime(FILE_TIMESTAMP_FORMAT)
+    extension = JSONL_EXTENSION + (GZIP_EXTENSION if compress else "")
+    return os.path.join(BASE_DIR, JSON_OUTPUT_DIR_NAME, f"{REPROCESS_FILE_PREFIX}{timestamp}{extension}")
 
-        if "rain" in entry:
-            if "3h" in entry["rain"]:
-                rain = entry["rain"]["3h"]
-            else:
-                rain = 0.0
-        else:
-            rain = 0.0
+def reprocess_raw_forecasts(source=None, output=None, workers=None, chunk_size=REPROCESS_CHUNK_SIZE, compress=False, backend="auto"):
+    """
+    Recalcule format_forecast pour tous les JSON raw d'un dossier ou de l'archive.
 
-        if "snow" in entry:
-            if "3h" in entry["snow"]:
-                snow = entry["snow"]["3h"]
-            else:
-                snow = 0.0
-        else:
-            snow = 0.0
-
-        temp = entry["main"]["temp"]
-        humidity = entry["main"]["humidity"]
-        # Extraction de list.weather.main en se basant sur la Doc API OpenWeatherMap (catégorie météo principale: Rain, Snow, Clouds, etc.)
-        weather_main = entry["weather"][0]["main"]
-
-        # Mise à jour des totaux
-        result["total_rain_period_mm"] += rain
-        result["total_snow_period_mm"] += snow
-
-        if humidity > result["max_humidity_period"]:
-            result["max_humidity_period"] = humidity
-
-        # Vérifier si ce jour existe déjà
-        if date_str not in days:
-            days[date_str] = {}
-            days[date_str]["rain_cumul_mm"] = 0.0
-            days[date_str]["snow_cumul_mm"] = 0.0
-            days[date_str]["entries"] = []
-
-        # Ajouter les données de la journée
-        days[date_str]["rain_cumul_mm"] += rain
-        days[date_str]["snow_cumul_mm"] += snow
-
-        # Stocker l'état météo complet (temp + weather) pour une comparaison et calcul de transitions majeures plus simple
-        days[date_str]["entries"].append({
-            "temp": temp,
-            "weather": weather_main  
-        })
-
-    # Calcul des transitions majeures 
-    for date in days:
-
-        entries = days[date]["entries"]
-        major_transitions = calcul_major_transitions(entries)
-
-        # Ajouter l'entrée journalière au résultat final
-        day_result = {
-            "date_local": date,
-            "rain_cumul_mm": round(days[date]["rain_cumul_mm"], 2),
-            "snow_cumul_mm": round(days[date]["snow_cumul_mm"], 2),
-            "major_transitions_count": major_transitions
-        }
+    Le travail est découpé en tâches de chunk_size éléments réparties sur un pool de
+    processus, avec au plus REPROCESS_INFLIGHT_PER_WORKER tâches en attente par processus.
+    Les résultats (un par ligne, avec leur source) passent par BatchOutputWriter. Après
+    chaque tâche, un fichier de reprise (output + .checkpoint.json) est mis à jour : relancer
+    avec le même output reprend là où le traitement s'est arrêté.
 
-        result["forecast_details"].append(day_result)
+    Retourne (chemin du fichier, nombre de résultats, nombre d'erreurs) ; chemin None si interrompu.
+    """
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-    return result
+    source = os.path.abspath(get_archive_path(source))
+    kind = "directory" if os.path.isdir(source) else "archive"
+    workers = max(1, workers or os.cpu_count() or 1)
 
-# Sauvegarde du résultat JSON dans un fichier
-def save_to_file(data, filename=None, city=None, country=None):
-    
-    # Création du dossier JSON Output s'il n'existe pas
-    output_dir = os.path.join(BASE_DIR, JSON_OUTPUT_DIR_NAME)
-    if not os.path.exists(output_dir):
+    output = os.path.abspath(output or reprocess_output_path(compress))
+    checkpoint_path = output + CHECKPOINT_EXTENSION
+
+    # Sérialiseur choisi ici : les processus ne font aucun import optionnel ni log
+    if backend == "auto":
         try:
-            os.makedirs(output_dir)
-            logger.info(f"Dossier '{JSON_OUTPUT_DIR_NAME}' créé : {output_dir}")
-        except Exception as e:
-            logger.error(f"Erreur lors de la création du dossier '{JSON_OUTPUT_DIR_NAME}' : {e}")
-            return None
-    
-    # Sauvegarde les données JSON formatées dans un fichier. Si le nom de fichier n'est pas fourni, on génère un nom automatique.
-    if filename is None:
-        city_name = data.get("forecast_location_name", DEFAULT_CITY_NAME)
-        country_code = data.get("country_code", "")
-        timestamp = datetime.now().strftime(FILE_TIMESTAMP_FORMAT)
-        filename = f"{city_name}_{country_code}_{timestamp}{JSON_EXTENSION}"
-    
-    # S'assurer que le fichier a l'extension .json
-    if not filename.endswith(JSON_EXTENSION):
-        filename += JSON_EXTENSION
-    
-    # Chemin complet du fichier dans le dossier JSON Output
-    complete_path = os.path.join(output_dir, filename)
-    
+            import orjson  # noqa: F401
+            backend = "orjson"
+        except ImportError:
+            backend = "json"
+
+    # Reprise : même source, même découpage et mêmes statistiques, fichier .part tronqué au dernier point sûr
+    aggregation = get_aggregation()
+    signature = aggregation.signature() if aggregation else None
+    checkpoint = _load_checkpoint(checkpoint_path)
+    if checkpoint is not None:
+        if (checkpoint["source"] != source or checkpoint.get("aggregation") != signature
+                or not os.path.exists(output + PARTIAL_EXTENSION)):
+            raise click.ClickException(f"Fichier de reprise incompatible ou fichier partiel absent : {checkpoint_path}")
+        chunk_size = checkpoint["chunk_size"]
+
+        # Tâches identifiées par leur position : la source ne doit pas avoir changé (fichiers ajoutés ou supprimés)
+        done = set(checkpoint["done"])
+        fingerprints = checkpoint.get("fingerprints", {})
+        chunk_count = 0
+        for chunk_id, chunk in _iter_reprocess_chunks(kind, source, chunk_size):
+            chunk_count += 1
+            if chunk_id in done and fingerprints.get(str(chunk_id)) != _chunk_fingerprint(chunk):
+                raise click.ClickException(f"La source a changé depuis l'interruption (tâche {chunk_id}), reprise impossible : supprimer {checkpoint_path}")
+        if any(chunk_id >= chunk_count for chunk_id in done):
+            raise click.ClickException(f"La source a changé depuis l'interruption (fichiers supprimés), reprise impossible : supprimer {checkpoint_path}")
+
+        with open(output + PARTIAL_EXTENSION, "r+b") as f:
+            f.truncate(checkpoint["offset"])
+        logger.info(f"Reprise du retraitement : {len(checkpoint['done'])} tâche(s) déjà faite(s), {checkpoint['count']} résultat(s)")
+    else:
+        checkpoint = {"source": source, "chunk_size": chunk_size, "done": [], "fingerprints": {}, "offset": 0, "count": 0, "errors": 0}
+        if signature is not None:
+            checkpoint["aggregation"] = signature
+
+    done = set(checkpoint["done"])
+
+    logger.info(f"Retraitement de {source} ({kind}) vers {output} : {workers} processus, tâches de {chunk_size}")
+    writer = BatchOutputWriter(output, compress=compress, backend=backend, append=checkpoint["offset"] > 0)
+    writer.count = checkpoint["count"]
+
+    def collect(finished):
+        for future in finished:
+            chunk_id, fingerprint = pending.pop(future)
+            lines, errors = future.result()
+            for item, error in errors:
+                logger.error(f"Retraitement impossible pour {item} : {error}")
+            writer.write_lines(lines)
+            metrics.inc("reports_total", len(lines), result="ok")
+            if errors:
+                metrics.inc("reports_total", len(errors), result="error")
+            done.add(chunk_id)
+            checkpoint["fingerprints"][str(chunk_id)] = fingerprint
+            checkpoint["errors"] += len(errors)
+            checkpoint.update(done=sorted(done), offset=writer.checkpoint(), count=writer.count)
+            _save_checkpoint(checkpoint_path, checkpoint)
+
+    pending = {}
     try:
-        logger.info(f"Écriture du fichier JSON : {complete_path}")
-        with open(complete_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-        logger.success(f"Fichier JSON écrit avec succès : {complete_path}")
-        return complete_path
-    except Exception as e:
-        logger.error(f"Erreur lors de l'écriture du fichier JSON : {e}")
-        return None
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_id, chunk in _iter_reprocess_chunks(kind, source, chunk_size):
+                if chunk_id in done:
+                    continue
+                future = executor.submit(_reprocess_chunk, kind, source, chunk, backend, aggregation)
+                pending[future] = (chunk_id, _chunk_fingerprint(chunk))
+                if len(pending) >= workers * REPROCESS_INFLIGHT_PER_WORKER:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+    except (KeyboardInterrupt, Exception) as e:
+        writer.close(finalize=False)
+        logger.warning(f"Retraitement interrompu ({e.__class__.__name__}), reprise possible via {checkpoint_path}")
+        if not isinstance(e, KeyboardInterrupt):
+            raise
+        return None, checkpoint["count"], checkpoint["errors"]
+
+    path = writer.close()
+    # Aucun fichier de reprise si la source était vide
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    logger.info(f"Retraitement terminé : {writer.count} résultat(s), {checkpoint['errors']} erreur(s)")
+    return path, writer.count, checkpoint["errors"]
 
 # Fonction pour afficher l'ASCII art de Weather Report venant du Manga JOJO's Bizarre Adventure : Stone Ocean
 def display_ascii_art():
-    ascii_art = """Weather Report manipulates the weather.
-    
-    ⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣧⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⣿⣿⣿⣿⣿⣿⡿⠛⢛⣋⣭⣤⣬⣉⣉⠛⠉⠙⠋⠙⠛⠛⠟⠛⠿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⡟⠃⠘⠿⠿⠟⣋⣁⣴⣾⣿⣿⣿⣿⣿⣿⣿⣿⣶⣦⣤⣤⣤⡆⠀⠀⠰⠤⠬⢉⠙⢿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⠀⣶⡄⢠⣾⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡟⠀⠀⠀⣶⣶⣶⣿⣷⡄⠻⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡇⣿⣿⣿⣿⣿⠀⠂⠹⢀⣽⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⠏⠀⠀⠀⢐⣿⣿⣿⣿⣿⣿⡄⢻⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⡇⢹⣿⣿⣿⣿⣿⡟⢹⣿⣿⡇⣿⣿⣿⣿⠇⠀⠀⣠⣾⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⠁⢀⣤⣴⣶⣿⣿⣿⣿⣿⣿⣿⣯⠀⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⡇⢸⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⠃⠀⣴⣿⣿⣿⡿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣧⣼⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⠀⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢹⡇⢸⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣏⠂⣸⣿⣿⣿⣿⣷⣌⠿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡟⠀⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⣼⣿⣿⡇⣿⣿⣿⣿⠸⠿⣿⣿⣿⣿⣿⣿⣦⢹⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⠁⠁⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⢻⣿⣿⡇⣿⣿⣿⣿⠆⣸⣿⣿⣿⣿⣿⣿⣿⣿⡟⠙⢿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡟⠀⠀⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⢹⣿⣿⡇⣿⣿⣿⡇⠀⢿⠿⣿⣿⣿⣿⣿⣿⣿⠠⠀⠈⠿⢿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣷⣾⢀⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⣼⣿⣿⡇⣿⣿⣿⣇⠀⠀⠾⣿⣿⣿⣿⢿⠟⠁⠀⣤⣾⣆⠀⠙⠿⣿⡟⢿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⠛⣿⣿⡏⣼⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⣻⣿⣿⡇⣿⣿⣿⣿⡆⢻⠀⣿⣿⣿⠟⠁⠀⠀⠁⠙⣿⣿⣿⣿⣶⣄⡙⠦⠹⣿⣿⣿⣿⣿⣿⣿⣿⡏⠂⢸⣿⡇⣶⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⢼⣿⣿⡇⣿⣿⣿⣿⡇⠀⣾⣿⠏⠀⠀⠀⠙⠗⠁⢀⣿⡏⠹⠿⠛⠛⠁⠄⣄⠈⠻⣿⣿⣿⣿⣿⣿⠻⣅⣼⣿⡇⢿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⡇⢰⣿⣿⡄⢀⡄⠀⠀⠈⠀⢿⣿⣷⡀⠀⠀⠀⠀⠄⣰⣦⡀⠈⠙⢿⣿⣿⣿⣦⣿⣿⣿⡗⢸⣿⣿⣿⣿⣿⣿⡿⣿
-    ⣿⣿⣿⣿⢸⡇⢸⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⠃⠸⣿⢿⠇⠘⠡⡤⠀⠀⠀⠸⠿⣿⣷⣌⣰⣦⣴⣶⣿⣿⡏⠀⠀⠘⣿⣿⣿⣿⣿⣿⣿⠃⢸⣿⣿⣿⣿⣿⣿⡏⢹
-    ⣿⡿⣣⡧⠘⠃⢸⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⡄⢸⣿⡎⠀⠀⠀⣿⣿⣤⡶⢠⣤⡄⢿⡿⢸⣿⣿⣿⣿⡟⢀⣾⠀⠀⢻⣿⣿⣿⣿⣿⠇⠀⣾⣿⣿⣿⣿⣿⣿⣿⣸
-    ⠥⠚⠉⠚⠀⣀⣸⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⣇⠘⣿⣷⡀⠀⠀⢹⣿⣿⡿⢿⣿⡿⠿⢣⣿⣿⣿⣿⡿⠀⣸⣿⠃⠀⢼⣿⣿⣿⣿⣧⡀⢰⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⠄⠀⢀⣤⣾⣿⣿⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⣿⡀⣿⡽⣷⣄⠀⠀⣿⣿⣷⡆⠉⣴⣿⣿⣿⣿⣿⣿⡀⣠⣧⠊⠀⠀⢸⣿⣿⣿⣿⣿⢃⣾⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣠⣼⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⢸⣿⣿⡇⣿⣿⣿⣿⣿⣧⠈⠁⠻⠇⠀⠀⠈⣿⡧⠠⣀⣤⣤⡌⢉⣻⣿⣿⣿⡿⠃⠀⠀⠀⠀⢿⣿⣿⣿⠇⣸⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⠏⢸⣿⣿⡇⣿⣿⣿⣿⣿⣿⡇⠀⢀⣀⠀⠀⠀⠈⢻⣶⣦⣤⣴⣶⣾⣿⡟⠛⣉⣤⣾⠆⠀⠀⠀⠀⠉⠉⠉⣰⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⢋⣡⣦⢸⣿⣿⡇⣿⣿⣿⡿⠛⣡⣴⣿⠟⣁⣴⣧⠀⢠⡀⠙⠿⣿⣿⡿⠛⠋⣠⣾⣿⣿⡏⠀⠄⠀⠀⢀⣀⣤⣾⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⣿⡿⠟⣉⣤⣾⣿⡇⣾⣿⣿⠇⠛⠉⢀⣴⣿⣿⣋⣡⣾⣿⣿⣿⣿⣷⡄⠻⣶⡄⠀⠀⠀⣀⣼⣿⣿⣿⣿⠃⠀⢀⣠⣶⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⠟⢋⣴⣾⣿⣿⣿⣿⡇⢺⡿⠃⠀⠀⣰⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣦⠀⠡⡄⠀⢀⣿⣿⣿⣿⣿⠇⡀⠀⠙⠿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣷⣿⣿⣿⣿
-    ⣿⣿⣟⣁⣼⣿⣿⣿⣿⣿⡿⠟⠁⠀⠀⠀⠀⠐⠿⠿⠿⢹⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡟⠃⠀⣿⣿⣆⣉⠛⠿⠿⠏⢰⠇⣀⡀⠀⠀⠙⠿⠿⠿⢿⣿⣿⣿⣿⣿⣿⣿⣿⣿⢻⣿
-    ⡿⢿⣿⣿⣿⣿⣿⣿⡿⠋⠀⠀⠀⠀⠀⣠⣶⣦⠀⠀⠀⠀⠀⠀⠉⠉⠉⠉⠛⠛⠏⠠⠆⠀⠹⣿⣿⣿⣿⣦⣀⣰⣿⠰⣿⣿⣶⣄⠀⠀⠀⠀⢻⣿⣾⣿⣿⣿⣿⣿⣿⣿⣿⣯
-    ⣿⣿⣿⣿⣿⣿⡿⠋⠀⠀⠀⠀⠀⠀⠈⠉⠀⠈⠀⠀⣠⣾⣿⠀⠀⠀⠀⠀⣀⠀⠀⠀⠀⠈⠀⠘⠛⠿⢿⣿⣿⣿⣿⣄⣹⣿⣿⣿⣷⣦⡀⠀⠀⠀⠀⠉⠛⣿⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⣿⠏⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠊⠉⠀⠈⠀⠀⠀⠀⣸⣿⡇⠀⠀⠀⢠⡀⠀⠀⠀⠀⠀⠉⠉⠉⠛⠻⠿⠿⣿⣿⡿⢁⣤⡀⠀⠀⠀⠀⠘⣿⣿⣿⣿⣿⣿
-    ⣿⣿⣿⣿⠃⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣼⡿⠛⡇⠀⠀⢠⣿⣿⠀⠀⠀⠀⠀⣶⣦⡄⠀⠀⠀⠀⠀⠀⠀⠙⠛⠃⠀⠀⠴⠆⠀⠈⠻⣿⣿⣿⣿
-    ⣿⣿⣿⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠚⠉⠀⠀⠇⠀⠀⣼⣿⣿⣇⠀⠀⠀⠀⠟⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠹⣿⣿⣿
-    ⣿⣿⠃⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢰⠟⠙⠿⣿⡄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢻⣿⣿
-    ⣿⣿⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠘⠃⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⣀⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢦⢿⣿
-    ⣿⣿⣷⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣀⣀⣀⣀⣠⣤⣴⣶⣶⣾⡿⠿⠛⠓⠀⠀⠀⠀⠀⠀⠀⠘⡎⣿
-    ⣿⣿⣿⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠈⠉⣹⣿⣿⣿⣿⡿⠟⠛⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠁⣾
-    ⣿⣿⣿⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢠⠖⠀⣼⣿⠿⠛⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢹
-    ⡿⠛⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢐⠈⠀⠘⠉⢁⡄⠄⠀⠀⠀⠀⠀⢀⣀⣴⡾⠋⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠸
-    ⡇⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢜⠼⢰⣠⠈⠘⢑⠀⠀⠀⢀⣤⣾⡿⠋⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠀⠀⠀⠀⠀⠄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠈⠠⠤⠀⠀⢀⣠⣾⣿⠟⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠀⠀⠀⠀⠀⢈⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠐⢿⡿⠋⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢸
-    ⠀⠀⠀⠀⠀⠶⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠀⠀⠁⠀⠀⠂⠀⠀⠀⠀⠀⠀⢰⡆⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣀⠀⠀⠀⠀⠀⠀⠀⢶⣶⡆
-    ⠀⠀⠀⠀⠀⠀⠀⠂⠀⠀⠀⠀⠀⣿⣷⡀⠀⠀⣐⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⠞⠁⠀⠀⠀⠀⠀⠀⠀⠀⠙⠇
-    ⠀⢀⢲⡀⠂⠀⠀⠀⠀⠀⠀⠀⠀⣼⣿⣿⢇⠀⠀⠉⠀⠀⠀⠀⠀⠀⠀⠐⢀⠐⢎⠀⠒⠌⠈⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⣾⡟⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠈⠀⠐⠂⠀⠀⠀⠀⠀⢀⡄⣿⣿⣿⢸⣆⠘⣿⣆⠀⠀⠀⠀⠀⠀⠀⠑⢒⠐⠑⠂⠁⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⣾⣿⣿⠃⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⣾⣿⠀⣿⣿⣿⢸⣿⣆⠈⢻⣦⡀⠀⠀⠀⠀⠀⠐⠀⠂⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⣿⣿⣿⡏⠀⠀⠀⠀⣴⡇⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⣦⣄⣀⠀⠀⠀⠀⠀⠀⠘⣻⣿⡄⣿⣿⡟⢸⣿⣿⣦⡀⠻⣿⣄⠀⠀⠀⠀⠈⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣰⣿⣿⣿⡟⠁⠀⠀⠀⣸⡟⠀⠀⠀⠀⠀⠀⠀⠘⣿⣶
-    ⣿⣿⣿⣿⣷⣦⡀⠀⠀⣾⣿⣿⡇⣿⣿⣇⢸⣿⣿⣿⣿⣦⣄⠉⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⢀⣼⠟⠛⣿⣿⡇⠀⠀⠀⣸⣿⠇⠀⠀⠀⠀⠀⠀⠀⠀⠈⠻
-    ⠈⠙⢝⣿⠿⠿⠕⠂⠀⠈⠙⢿⡇⣿⣿⡇⢸⣿⣿⣿⣿⣿⣿⣿⣶⣤⣀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠈⠁⠀⠀⣿⡿⠃⠀⠀⣼⣿⡏⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠉⠉⠈⠀⠈⠀⠀⠀⠀⠈⠁⣿⣿⡇⢸⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣦⡄⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠉⠀⠀⢀⣼⣿⣿⡇⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
-    ⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣿⣿⡇⢸⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⣿⡿⠋⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⣠⣿⣿⣿⠏⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀"""
+    # L'ASCII art est lu depuis un fichier à la demande (pas de gros littéral chargé à l'import)
+    with open(os.path.join(BASE_DIR, ASCII_ART_FILE_NAME), "r", encoding="utf-8") as f:
+        ascii_art = f.read()
     print(ascii_art)
 
 # Fonction pour exécuter le rapport météo (logique séparée pour click et mode interactif)
-def execute_weather_report(city, country, api_key=None, display=True, quiet=False):
+def execute_weather_report(city, country, api_key=None, display=True, quiet=False, use_cache=True, refresh=False, writer=None, incremental=False, location=None):
     
     #Exécute le rapport météo pour une ville donnée. Charge la clé API si non fournie
     if api_key is None:
@@ -356,36 +1801,47 @@ def execute_weather_report(city, country, api_key=None, display=True, quiet=Fals
                 click.echo("Erreur : clé API introuvable ou vide dans 'local.conf'.", err=True)
             return False
 
-    url = (f"http://api.openweathermap.org/data/2.5/forecast?q={city},{country}&appid={api_key}&units=metric&lang=fr")
+    # Sans identifiant ni coordonnées, le nom est résolu via l'index local des villes s'il existe
+    if location is None:
+        location = resolve_location(city, country)
 
     logger.info(f"Envoi de la requête API pour {city}, {country}")
     if not quiet:
         print("\nRequête envoyée\n")
 
     try:
-        response = requests.get(url)
-
-        if response.status_code != 200:
-            logger.error(f"Erreur API ({response.status_code}) : {response.text}")
-            if not quiet:
-                print(f"Erreur API, veuillez vérifier vos arguments ou clé API ({response.status_code}) : {response.text}")
-            else:
-                click.echo(f"Erreur API, veuillez vérifier vos arguments ou clé API ({response.status_code})", err=True)
-            return False
-
-        data = response.json() # Récupération du JSON raw
+        data = fetch_forecast_data(city, country, api_key, use_cache=use_cache, refresh=refresh, location=location) # Récupération du JSON raw
         logger.info(f"Données JSON brutes récupérées pour {city}, {country}")
         
-        formatted = format_forecast(data) # Formatage du JSON raw
+        # Mode incrémental : seuls les jours modifiés depuis l'appel précédent sont produits
+        if incremental:
+            formatted = update_forecast_state(city, country, data, location=location)
+            if not formatted["forecast_details"]:
+                logger.info(f"Aucun changement depuis le dernier appel pour {city}, {country}, rien à écrire")
+                if not quiet:
+                    print("Aucun changement depuis le dernier appel.")
+                metrics.inc("reports_total", result="unchanged")
+                return True
+        else:
+            with metrics.span("format"):
+                formatted = format_forecast(data, get_aggregation()) # Formatage du JSON raw
         logger.info(f"JSON formaté généré avec succès pour {city}, {country}")
         
         # Afficher le résultat si demandé
         if display:
             print(json.dumps(formatted, indent=4, ensure_ascii=False))
         
+        # Écriture groupée (mode batch JSON Lines) : une ligne dans le fichier du batch
+        if writer is not None:
+            with metrics.span("save"):
+                writer.write(formatted)
+            metrics.inc("reports_total", result="ok")
+            return True
+
         # Sauvegarde dans un fichier
         logger.info(f"Début de la sauvegarde du fichier pour {city}, {country}")
-        saved_file = save_to_file(formatted, city=city, country=country)
+        with metrics.span("save"):
+            saved_file = save_to_file(formatted, city=city, country=country, suffix=DELTA_FILE_SUFFIX if incremental else "")
         if saved_file:
             logger.success(f"Fichier sauvegardé avec succès : {saved_file}")
             if not quiet:
@@ -395,9 +1851,22 @@ def execute_weather_report(city, country, api_key=None, display=True, quiet=Fals
             if not quiet:
                 print("\nErreur lors de la sauvegarde du fichier.")
         
+        metrics.inc("reports_total", result="ok")
         return True
 
-    except requests.exceptions.RequestException as e:
+    except WeatherAPIError as e:
+        metrics.inc("reports_total", result="error")
+        logger.error(f"Erreur API ({e.status_code}) : {e.text}")
+        if e.status_code == 401:
+            logger.error("Clé API invalide ou expirée")
+        if not quiet:
+            print(f"Erreur API, veuillez vérifier vos arguments ou clé API ({e.status_code}) : {e.text}")
+        else:
+            click.echo(f"Erreur API, veuillez vérifier vos arguments ou clé API ({e.status_code})", err=True)
+        return False
+
+    except WeatherNetworkError as e:
+        metrics.inc("reports_total", result="error")
         logger.error(f"Erreur réseau lors de la requête API : {e}")
         if not quiet:
             print(f"Erreur réseau : {e}")
@@ -405,6 +1874,464 @@ def execute_weather_report(city, country, api_key=None, display=True, quiet=Fals
             click.echo(f"Erreur réseau : {e}", err=True)
         return False
 
+# Lecture d'une liste de villes (une paire "ville,pays" par ligne) depuis un fichier ou stdin
+def load_city_list(lines):
+    """
+    Transforme des lignes "ville,pays" en liste de tuples (ville, pays).
+
+    Les lignes vides et les commentaires (#) sont ignorés, les doublons supprimés
+    sans tenir compte de la casse ("paris,fr" et "Paris,FR" sont la même ville).
+    Le séparateur est la dernière virgule, ce qui permet "New York,US".
+    """
+    pairs = []
+    seen = set()
+
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith(BATCH_COMMENT_PREFIX):
+            continue
+
+        if "," not in line:
+            logger.warning(f"Ligne {line_number} ignorée (format attendu 'ville,pays') : {line}")
+            continue
+
+        city, country = line.rsplit(",", 1)
+        pair = (city.strip(), country.strip())
+        if not pair[0] or not pair[1]:
+            logger.warning(f"Ligne {line_number} ignorée (ville ou pays vide) : {line}")
+            continue
+
+        key = (pair[0].casefold(), pair[1].casefold())
+        if key in seen:
+            logger.warning(f"Ligne {line_number} ignorée (doublon) : {line}")
+            continue
+
+        seen.add(key)
+        pairs.append(pair)
+
+    return pairs
+
+# Sélection des villes de l'index local dans une zone "lon_min,lat_min,lon_max,lat_max" (option --bbox)
+def load_bbox_cities(bbox):
+    """
+    Retourne les tuples (ville, pays, location_by_id) des villes de l'index dans la zone.
+
+    L'API forecast n'a pas de requête groupée : chaque ville reste un appel, mais par
+    identifiant (sans ambiguïté de nom, clé de cache stable).
+    """
+    try:
+        lon_min, lat_min, lon_max, lat_max = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise click.BadParameter("format attendu : lon_min,lat_min,lon_max,lat_max", param_hint="--bbox")
+
+    index = get_city_index()
+    if index is None:
+        raise click.UsageError(f"--bbox nécessite l'index des villes ({get_city_index_path()}), voir la commande city-index build.")
+
+    cities = [(record["name"], record["country"], location_by_id(record["id"])) for record in index.within(lon_min, lat_min, lon_max, lat_max)]
+    logger.info(f"Zone {bbox} : {len(cities)} ville(s) sélectionnée(s) dans l'index")
+    return cities
+
+# Exécution du rapport météo pour plusieurs villes en parallèle (mode batch)
+def execute_batch_report(pairs, api_key, workers=DEFAULT_BATCH_WORKERS, use_cache=True, refresh=False, writer=None, incremental=False):
+    """
+    Lance execute_weather_report pour chaque (ville, pays) via un pool de threads.
+    Un troisième élément optionnel (location_by_id, location_by_coords) remplace le nom.
+
+    Le temps total dépend du nombre de requêtes simultanées (workers) et non du
+    nombre de villes. Avec writer (BatchOutputWriter), tous les résultats vont dans un
+    seul fichier JSON Lines. Retourne la liste des tuples (ville, pays, succès) dans l'ordre d'entrée.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    workers = max(1, workers)
+    logger.info(f"Début du mode batch : {len(pairs)} ville(s), {workers} requête(s) simultanée(s)")
+
+    def run(pair):
+        city, country = pair[:2]
+        location = pair[2] if len(pair) > 2 else None
+        try:
+            return execute_weather_report(city, country, api_key, display=False, quiet=True, use_cache=use_cache, refresh=refresh, writer=writer, incremental=incremental, location=location)
+        except Exception as e:
+            # Une ville en erreur ne doit pas interrompre le batch
+            logger.error(f"Erreur inattendue pour {city}, {country} : {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(run, pairs))
+
+    results = [(pair[0], pair[1], ok) for pair, ok in zip(pairs, outcomes)]
+    succeeded = sum(1 for _, _, ok in results if ok)
+    logger.info(f"Fin du mode batch : {succeeded} succès, {len(results) - succeeded} échec(s)")
+    return results
+
+# Affichage des métriques collectées (--stats), sur stderr pour ne pas mélanger avec le JSON affiché
+def print_stats():
+    click.echo("\n===== Statistiques =====", err=True)
+    for line in metrics.summary_lines():
+        click.echo(line, err=True)
+
+# Affichage du résumé du mode batch (succès / échec par ville)
+def print_batch_summary(results):
+    click.echo("\n===== Résumé du batch =====")
+    for city, country, ok in results:
+        status = "OK" if ok else "ÉCHEC"
+        click.echo(f"{status:<6} {city}, {country}")
+
+    succeeded = sum(1 for _, _, ok in results if ok)
+    click.echo(f"\n{succeeded}/{len(results)} ville(s) traitée(s) avec succès.")
+
+# Mode service : serveur HTTP asyncio exposant format_forecast (GET /report?city=&country=)
+class ReportServer:
+    """
+    Serveur HTTP/1.1 minimal (keep-alive) pour les tableaux de bord.
+
+    La clé API, la session HTTP et le cache restent chargés entre les requêtes. Les
+    appels à l'API (bloquants) tournent dans un pool de threads, et les requêtes
+    simultanées pour une même ville partagent un seul appel (coalescence).
+    """
+
+    def __init__(self, api_key, host=DEFAULT_SERVER_HOST, port=DEFAULT_SERVER_PORT, workers=DEFAULT_SERVER_WORKERS):
+        self.api_key = api_key
+        self.host = host
+        self.port = port
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self.inflight = {}  # (clé de cache, refresh) -> Future de l'appel en cours
+
+    def build_report(self, city, country, refresh=False, location=None):
+        # Exécuté dans le pool de threads : récupération (cache ou API) puis formatage
+        data = fetch_forecast_data(city, country, self.api_key, refresh=refresh, location=location)
+        with metrics.span("format"):
+            return format_forecast(data, get_aggregation())
+
+    async def get_report(self, city, country, refresh=False, location=None):
+        import asyncio
+
+        if location is None:
+            location = resolve_location(city, country)
+        key = (cache_key(city, country, location=location), refresh)
+        future = self.inflight.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self.build_report, city, country, refresh, location)
+            self.inflight[key] = future
+            future.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            logger.info(f"Requête coalescée pour {city}, {country}")
+
+        # shield : la déconnexion d'un client n'annule pas l'appel partagé
+        return await asyncio.shield(future)
+
+    async def handle_request(self, method, target):
+        # Retourne (code HTTP, corps JSON)
+        if method != "GET":
+            return 405, {"error": "Méthode non supportée"}
+
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {"status": "ok"}
+        if url.path == "/metrics":
+            return 200, metrics.render_prometheus()
+        if url.path != "/report":
+            return 404, {"error": f"Chemin inconnu : {url.path}"}
+
+        params = parse_qs(url.query)
+        city = params.get("city", [""])[0].strip()
+        country = params.get("country", [""])[0].strip()
+        refresh = params.get("refresh", ["0"])[0] in ("1", "true", "yes")
+
+        # Lieu désigné par identifiant (id=) ou coordonnées (lat= et lon=) plutôt que par nom
+        try:
+            if "id" in params:
+                location = location_by_id(params["id"][0])
+            elif "lat" in params and "lon" in params:
+                location = location_by_coords(params["lat"][0], params["lon"][0])
+            else:
+                location = None
+        except ValueError:
+            return 400, {"error": "Paramètres 'id', 'lat' ou 'lon' invalides"}
+
+        if location is not None:
+            city = city or urlencode(location)
+        elif not city or not country:
+            return 400, {"error": "Paramètres 'city' et 'country' (ou 'id', ou 'lat' et 'lon') obligatoires"}
+
+        try:
+            return 200, await self.get_report(city, country, refresh, location)
+        except WeatherAPIError as e:
+            logger.error(f"Erreur API ({e.status_code}) pour {city}, {country} : {e.text}")
+            status = 404 if e.status_code == 404 else 503 if e.status_code == 429 else 502
+            return status, {"error": f"Erreur API OpenWeatherMap ({e.status_code})"}
+        except WeatherNetworkError as e:
+            logger.error(f"Erreur réseau pour {city}, {country} : {e}")
+            return 504, {"error": "Erreur réseau vers OpenWeatherMap"}
+        except Exception as e:
+            logger.exception(f"Erreur inattendue pour {city}, {country} : {e}")
+            return 500, {"error": "Erreur interne"}
+
+    async def read_headers(self, reader):
+        # Retourne (code d'erreur ou None, en-têtes) ; au-delà de SERVER_MAX_HEADER_LINES : 431
+        headers = {}
+        for _ in range(SERVER_MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return None, headers
+            name, separator, value = line.decode("latin-1").partition(":")
+            if not separator:
+                return 400, headers
+            headers[name.strip().lower()] = value.strip()
+        return 431, headers
+
+    async def read_body(self, reader, headers):
+        # Lit et ignore le corps éventuel pour que la requête suivante commence au bon endroit ; retourne un code d'erreur ou None
+        if "transfer-encoding" in headers:
+            return 411
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            return 400
+        if int(length) > SERVER_MAX_BODY_BYTES:
+            return 413
+        if int(length):
+            await reader.readexactly(int(length))
+        return None
+
+    async def send_response(self, writer, status, body, keep_alive):
+        # Corps texte (/metrics) ou JSON (tous les autres chemins)
+        if isinstance(body, str):
+            payload, content_type = body.encode("utf-8"), METRICS_CONTENT_TYPE
+        else:
+            payload, content_type = json.dumps(body, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        import asyncio
+
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), SERVER_KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+
+                parts = request_line.decode("latin-1").split()
+                error, headers = await self.read_headers(reader)
+                if error is None and len(parts) != 3:
+                    error = 400
+                if error is None:
+                    error = await self.read_body(reader, headers)
+
+                if error is not None:
+                    # Requête mal formée : la suite du flux n'est plus fiable, la connexion est fermée
+                    status, body = error, {"error": SERVER_REQUEST_ERRORS[error]}
+                    keep_alive = False
+                    metrics.inc("server_requests_total", path="other", status=str(status))
+                else:
+                    method, target, version = parts
+                    status, body = await self.handle_request(method, target)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                    path = urlsplit(target).path
+                    metrics.inc("server_requests_total", path=path if path in SERVER_PATHS else "other", status=str(status))
+
+                await self.send_response(writer, status, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.LimitOverrunError):
+            # Ligne de requête ou d'en-tête plus longue que la limite du StreamReader
+            try:
+                await self.send_response(writer, 400, {"error": SERVER_REQUEST_ERRORS[400]}, False)
+            except ConnectionError:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        import asyncio
+
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        logger.info(f"Serveur de rapports démarré sur http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        import asyncio
+
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            logger.info("Arrêt du serveur demandé (Ctrl+C)")
+        finally:
+            self.executor.shutdown(wait=False)
+            close_http_session()
+
+# Mode surveillance : rafraîchissement planifié d'une liste de villes dans un seul processus
+class WatchScheduler:
+    """
+    Ordonnanceur en processus (tas des prochaines échéances) pour une liste de villes.
+
+    Le premier passage répartit les villes sur un intervalle, celles dont le cache est le
+    plus ancien en premier ; chaque ville revient ensuite tous les interval ± jitter.
+    Un seul pool de threads, une seule session HTTP et un seul logger servent pendant toute
+    la durée de vie. La liste de villes et local.conf sont relus dès qu'ils changent (ou
+    sur SIGHUP), sans redémarrage.
+    """
+
+    def __init__(self, watchlist_path, api_key=None, interval=WATCH_INTERVAL_SECONDS, jitter=WATCH_JITTER,
+                 workers=DEFAULT_BATCH_WORKERS, incremental=False, aggregation_overrides=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.watchlist_path = watchlist_path
+        self.fixed_api_key = api_key
+        self.api_key = api_key
+        self.interval = interval
+        self.jitter = jitter
+        self.incremental = incremental
+        self.aggregation_overrides = aggregation_overrides
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch")
+        self.heap = []  # (échéance, numéro d'ordre, (ville, pays), génération)
+        self.sequence = 0
+        self.cities = {}  # (ville, pays) -> génération : une ville retirée puis rajoutée change de génération
+        self.running = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.reload_event = threading.Event()
+        self.mtimes = {}
+
+    def _changed(self, path):
+        # Vrai si le fichier a été modifié depuis la dernière lecture
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        changed = self.mtimes.get(path) != mtime
+        self.mtimes[path] = mtime
+        return changed
+
+    def _push(self, due, pair, generation):
+        self.sequence += 1
+        heapq.heappush(self.heap, (due, self.sequence, pair, generation))
+
+    def cache_age(self, city, country):
+        # Âge de la prévision en cache (infini si absente) : les plus anciennes passent en premier
+        age = read_cache_age(cache_key(city, country, location=resolve_location(city, country)))
+        return float("inf") if age is None else age
+
+    def schedule_new(self, pairs):
+        # Nouvelles villes réparties sur un intervalle, du cache le plus ancien au plus récent
+        if not pairs:
+            return
+        spacing = self.interval / len(pairs)
+        now = time.monotonic()
+        for position, pair in enumerate(sorted(pairs, key=lambda p: self.cache_age(*p), reverse=True)):
+            self._push(now + position * spacing + random.uniform(0, spacing * self.jitter), pair, self.cities[pair])
+
+    def reload(self, force=False):
+        config_changed = self._changed(os.path.join(BASE_DIR, CONFIG_FILE_NAME)) or force
+        if self.fixed_api_key is None and (config_changed or self.api_key is None):
+            api_key = load_api_key()
+            if api_key and api_key != self.api_key:
+                logger.info("Clé API (re)chargée depuis le fichier de configuration")
+                self.api_key = api_key
+        if config_changed:
+            try:
+                apply_aggregation_settings(self.aggregation_overrides)
+            except ValueError as e:
+                logger.error(f"Statistiques dérivées invalides dans {CONFIG_FILE_NAME}, réglages précédents conservés : {e}")
+
+        if not (self._changed(self.watchlist_path) or force):
+            return
+        try:
+            with open(self.watchlist_path, "r", encoding="utf-8") as f:
+                pairs = load_city_list(f)
+        except OSError as e:
+            logger.error(f"Liste de villes illisible ({self.watchlist_path}), liste précédente conservée : {e}")
+            return
+
+        added = [pair for pair in pairs if pair not in self.cities]
+        removed = set(self.cities) - set(pairs)
+        # Les entrées du tas des villes retirées (ou d'une génération précédente) sont ignorées à leur échéance
+        for pair in removed:
+            del self.cities[pair]
+        for pair in added:
+            self.sequence += 1
+            self.cities[pair] = self.sequence
+        self.schedule_new(added)
+        logger.info(f"Liste de villes chargée : {len(self.cities)} ville(s), {len(added)} ajoutée(s), {len(removed)} retirée(s)")
+
+    def refresh(self, pair):
+        # Exécuté dans le pool : rafraîchissement forcé (cache mis à jour) puis sauvegarde
+        city, country = pair
+        try:
+            execute_weather_report(city, country, self.api_key, display=False, quiet=True, refresh=True, incremental=self.incremental)
+        except Exception as e:
+            logger.error(f"Erreur inattendue pour {city}, {country} : {e}")
+        finally:
+            with self.lock:
+                self.running.discard(pair)
+
+    def run_pending(self):
+        # Lance les rafraîchissements échus et retourne le délai avant la prochaine échéance
+        now = time.monotonic()
+        while self.heap and self.heap[0][0] <= now:
+            due, _, pair, generation = heapq.heappop(self.heap)
+            if self.cities.get(pair) != generation:
+                continue
+            # Prochaine échéance calculée depuis l'échéance prévue (pas de dérive)
+            self._push(due + self.interval * random.uniform(1 - self.jitter, 1 + self.jitter), pair, generation)
+            with self.lock:
+                if pair in self.running:
+                    logger.warning(f"Rafraîchissement précédent encore en cours pour {pair[0]}, {pair[1]}, échéance sautée")
+                    continue
+                self.running.add(pair)
+            self.executor.submit(self.refresh, pair)
+        return self.heap[0][0] - now if self.heap else WATCH_RELOAD_CHECK_SECONDS
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        import signal
+
+        # SIGHUP : relecture immédiate de la liste et de local.conf (Unix)
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda *_: self.reload_event.set())
+
+        self.reload(force=True)
+        next_check = time.monotonic() + WATCH_RELOAD_CHECK_SECONDS
+        logger.info(f"Surveillance démarrée : intervalle {self.interval}s, variation ±{self.jitter:.0%}")
+        try:
+            while not self.stop_event.is_set():
+                if self.reload_event.is_set() or time.monotonic() >= next_check:
+                    self.reload(force=self.reload_event.is_set())
+                    self.reload_event.clear()
+                    next_check = time.monotonic() + WATCH_RELOAD_CHECK_SECONDS
+
+                if not self.api_key:
+                    logger.error("Clé API introuvable, rafraîchissements suspendus jusqu'à la modification de local.conf")
+                    delay = WATCH_RELOAD_CHECK_SECONDS
+                else:
+                    delay = self.run_pending()
+                self.stop_event.wait(max(0.0, min(delay, next_check - time.monotonic())))
+        except KeyboardInterrupt:
+            logger.info("Arrêt de la surveillance demandé (Ctrl+C)")
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            close_http_session()
+
 # Fonction pour appel API + JSON raw (mode interactif)
 def weather_report():
     api_key = load_api_key()
@@ -451,25 +2378,139 @@ def main_menu():
 
 
 
-# Commande CLI avec click
-@click.command()
+# Commande CLI avec click (groupe : sans sous-commande, mode CLI/batch/interactif habituel)
+@click.group(invoke_without_command=True)
 @click.option('--city', '-c', help='Nom de la ville')
 @click.option('--country', '-co', help='Code pays (FR, US, etc.)')
 @click.option('--api-key', '-k', help='Clé API OpenWeatherMap')
+@click.option('--city-id', type=click.IntRange(min=1), help='Identifiant OpenWeatherMap de la ville (à la place de --city/--country)')
+@click.option('--lat', type=click.FloatRange(-90, 90), help='Latitude du lieu (avec --lon, à la place de --city/--country)')
+@click.option('--lon', type=click.FloatRange(-180, 180), help='Longitude du lieu (avec --lat)')
+@click.option('--bbox', help="Mode batch sur les villes de l'index local dans la zone \"lon_min,lat_min,lon_max,lat_max\"")
+@click.option('--no-city-index', is_flag=True, help="Ne pas résoudre les noms de villes via l'index local (city-index build)")
 @click.option('--no-display', is_flag=True, help='Ne pas afficher le résultat formaté')
-def cli(city, country, api_key, no_display):
+@click.option('--batch', '-b', type=click.File('r', encoding='utf-8'), help='Fichier de villes "ville,pays" (une par ligne, "-" pour stdin)')
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=DEFAULT_BATCH_WORKERS, show_default=True, help='Nombre de requêtes simultanées en mode batch')
+@click.option('--pool-size', type=click.IntRange(min=1), help='Connexions HTTP keep-alive maximum par hôte (défaut : max(workers, 16))')
+@click.option('--no-cache', is_flag=True, help='Ne pas utiliser le cache disque des réponses API')
+@click.option('--refresh', is_flag=True, help='Ignorer le cache en lecture et le mettre à jour')
+@click.option('--cache-ttl', type=click.IntRange(min=0), default=CACHE_TTL_SECONDS, show_default=True, help='Durée de validité du cache (secondes)')
+@click.option('--stale', is_flag=True, help='Servir une réponse périmée du cache pendant son rafraîchissement en arrière-plan')
+@click.option('--archive', is_flag=True, help="Archiver chaque JSON raw récupéré depuis l'API (voir la commande replay)")
+@click.option('--output-format', type=click.Choice(OUTPUT_FORMATS), default="files", show_default=True, help='Mode batch : un fichier JSON par ville ou un seul fichier JSON Lines (gzip optionnel)')
+@click.option('--json-backend', type=click.Choice(JSON_BACKENDS), default="auto", show_default=True, help='Sérialiseur des fichiers JSON Lines')
+@click.option('--output-retention', type=click.IntRange(min=0), help="Supprimer les fichiers de 'JSON Output' plus vieux que N jours")
+@click.option('--output-max-files', type=click.IntRange(min=1), help="Nombre maximum de fichiers gardés dans 'JSON Output'")
+@click.option('--rate-limit', type=click.FloatRange(min=0), default=RATE_LIMIT_CALLS_PER_MINUTE, show_default=True, help="Appels API maximum par minute, tous threads confondus (0 : illimité)")
+@click.option('--max-retries', type=click.IntRange(min=0), default=API_MAX_RETRIES, show_default=True, help='Nouvelles tentatives sur 429, 5xx et erreurs réseau')
+@click.option('--timeout', type=click.FloatRange(min=0, min_open=True), default=API_TIMEOUT_SECONDS, show_default=True, help='Timeout de chaque requête API (secondes)')
+@click.option('--api-url', envvar='WEATHER_REPORT_API_URL', help="URL de l'endpoint forecast (défaut : API OpenWeatherMap, variable WEATHER_REPORT_API_URL)")
+@click.option('--incremental', is_flag=True, help="Fusionner chaque prévision dans l'état de la ville et n'écrire que les jours modifiés (delta)")
+@click.option('--derived-metrics', help=f"Statistiques par jour et sur la période, séparées par des virgules ({', '.join(DERIVED_METRICS)})")
+@click.option('--transition-temp-delta', type=click.FloatRange(min=0), help=f"Variation de température (°C) au-delà de laquelle une transition est majeure [défaut : {AggregationSpec().temp_delta}]")
+@click.option('--transition-weather-change/--no-transition-weather-change', default=None, help="Exiger aussi un changement de catégorie météo pour une transition majeure [défaut : oui]")
+@click.option('--stats', is_flag=True, help='Afficher en fin de programme la durée de chaque étape et les compteurs (sur stderr)')
+@click.option('--metrics-file', type=click.Path(dir_okay=False), help='Écrire les métriques au format texte Prometheus dans ce fichier en fin de programme')
+@click.pass_context
+def cli(ctx, city, country, api_key, city_id, lat, lon, bbox, no_city_index, no_display, batch, workers, pool_size, no_cache, refresh, cache_ttl, stale, archive,
+        output_format, json_backend, output_retention, output_max_files, rate_limit, max_retries, timeout, api_url,
+        incremental, derived_metrics, transition_temp_delta, transition_weather_change, stats, metrics_file):
     """
     Programme de rapport météorologique avec support CLI.
     
     Utilisation:
         python weather_report.py --city Paris --country FR
         python weather_report.py -c London -co GB --api-key YOUR_API_KEY
+        python weather_report.py --batch villes.txt --workers 16
+        python weather_report.py --city-id 2988507
+        python weather_report.py --bbox 2.2,48.8,2.5,48.9
+        python weather_report.py replay --select Paris,FR
+        python weather_report.py serve --port 8080
+        python weather_report.py watch villes.txt --interval 1800
     """
+    configure_cache(enabled=not no_cache, ttl=cache_ttl, stale_while_revalidate=stale)
+    configure_rate_limit(calls_per_minute=rate_limit)
+    configure_retry(max_retries=max_retries, timeout=timeout)
+    configure_api_url(api_url)
+    if no_city_index:
+        configure_city_index(enabled=False)
+    # Résumé et export des métriques à la fermeture du contexte (tous les modes, sous-commandes comprises)
+    if stats:
+        ctx.call_on_close(print_stats)
+    if metrics_file:
+        ctx.call_on_close(lambda: write_metrics_file(metrics_file))
+    if archive:
+        configure_archive(enabled=True)
+    # Statistiques dérivées et seuils des transitions : local.conf, puis options de la ligne de commande
+    aggregation_overrides = {
+        "metrics": parse_metric_names(derived_metrics) if derived_metrics is not None else None,
+        "temp_delta": transition_temp_delta,
+        "require_weather_change": transition_weather_change,
+    }
+    try:
+        apply_aggregation_settings(aggregation_overrides)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--derived-metrics / DERIVED_METRICS")
+
+    # Une sous-commande (replay, serve, ...) est demandée : elle gère elle-même son exécution
+    if ctx.invoked_subcommand is not None:
+        ctx.obj = {"api_key": api_key, "pool_size": pool_size, "incremental": incremental, "aggregation_overrides": aggregation_overrides}
+        return
+
+    if (lat is None) != (lon is None):
+        raise click.UsageError("--lat et --lon doivent être fournies ensemble.")
+
+    # Lieu désigné par identifiant ou coordonnées : pas de résolution de nom
+    location = None
+    if city_id is not None:
+        location = location_by_id(city_id)
+    elif lat is not None:
+        location = location_by_coords(lat, lon)
+    if location is not None:
+        city, country = city or urlencode(location), country or ""
+
+    # Mode batch : plusieurs villes lues depuis un fichier ou stdin, ou sélectionnées dans l'index par zone
+    if batch or bbox:
+        pairs = load_bbox_cities(bbox) if bbox else load_city_list(batch)
+        if not pairs:
+            click.echo("Erreur : aucune ville valide trouvée dans le fichier batch ou la zone.", err=True)
+            logger.info("Sortie du programme (fichier batch vide en mode CLI)")
+            return
+
+        loaded_key = api_key if api_key else load_api_key()
+        if not loaded_key:
+            click.echo("Erreur : Clé API introuvable dans 'local.conf'.", err=True)
+            click.echo("Utilisez --api-key pour fournir une clé API.", err=True)
+            logger.info("Sortie du programme (clé API introuvable en mode batch)")
+            return
+
+        # Pas de requête de test : seule une clé déjà connue comme invalide arrête le batch
+        if read_api_key_status(loaded_key) is False:
+            click.echo("Erreur : La clé API n'est pas valide.", err=True)
+            logger.info("Sortie du programme (clé API invalide en mode batch)")
+            return
+
+        # Le pool doit contenir au moins une connexion par requête simultanée
+        configure_http_session(pool_maxsize=pool_size or max(workers, HTTP_POOL_MAXSIZE))
+
+        if output_format == "files":
+            results = execute_batch_report(pairs, loaded_key, workers=workers, refresh=refresh, incremental=incremental)
+        else:
+            with BatchOutputWriter(compress=output_format == "jsonl.gz", backend=json_backend) as writer:
+                results = execute_batch_report(pairs, loaded_key, workers=workers, refresh=refresh, writer=writer, incremental=incremental)
+            click.echo(f"\nRésultats sauvegardés dans le fichier : {writer.path}")
+
+        print_batch_summary(results)
+        cleanup_output_dir(output_retention, output_max_files)
+        logger.info("Sortie du programme (mode batch terminé)")
     # Si des arguments CLI sont fournis, exécuter en mode CLI
-    if city and country:
-        # Vérifier la clé API
+    elif (city and country) or location is not None:
+        if pool_size:
+            configure_http_session(pool_maxsize=pool_size)
+
+        # Vérifier la clé API : pas de requête de test, la réponse de la vraie requête fait foi (401)
         if api_key:
-            if not verify_api_key(api_key, quiet=True):
+            if read_api_key_status(api_key) is False:
                 click.echo("Erreur : La clé API fournie n'est pas valide.", err=True)
                 logger.info("Sortie du programme (clé API invalide en mode CLI)")
                 return
@@ -481,14 +2522,15 @@ def cli(city, country, api_key, no_display):
                 click.echo("Utilisez --api-key pour fournir une clé API.", err=True)
                 logger.info("Sortie du programme (clé API introuvable en mode CLI)")
                 return
-            if not verify_api_key(loaded_key, quiet=True):
+            if read_api_key_status(loaded_key) is False:
                 click.echo("Erreur : La clé API n'est pas valide.", err=True)
                 logger.info("Sortie du programme (clé API invalide en mode CLI)")
                 return
             api_key = loaded_key
         
         # Exécuter le rapport météo
-        execute_weather_report(city, country, api_key, display=not no_display, quiet=True)
+        execute_weather_report(city, country, api_key, display=not no_display, quiet=True, refresh=refresh, incremental=incremental, location=location)
+        cleanup_output_dir(output_retention, output_max_files)
         logger.info("Sortie du programme (mode CLI terminé)")
     else:
         # Mode interactif : vérifier la clé API puis lancer le menu
@@ -509,6 +2551,170 @@ def cli(city, country, api_key, no_display):
             click.echo("Erreur : La clé API n'est pas valide ou ne fonctionne pas. Veuillez vérifier 'local.conf'", err=True)
             logger.info("Sortie du programme (clé API invalide)")
 
+# Sous-commande : rejouer les JSON raw archivés dans format_forecast
+@cli.command()
+@click.option('--select', '-s', 'selected', multiple=True, help='Ville à rejouer au format "ville,pays" (répétable, toutes par défaut)')
+@click.option('--since', type=click.DateTime(), help='Date de récupération minimale (ex : 2025-11-01)')
+@click.option('--until', type=click.DateTime(), help='Date de récupération maximale (une date seule inclut toute la journée)')
+@click.option('--archive-file', type=click.Path(exists=True, dir_okay=False), help="Chemin de l'archive (défaut : Archive/forecasts.wra)")
+@click.option('--save', is_flag=True, help='Sauvegarder chaque résultat dans JSON Output au lieu de l\'afficher')
+def replay(selected, since, until, archive_file, save):
+    """
+    Rejoue les prévisions archivées (option --archive) dans format_forecast.
+
+    L'archive est lue via mmap : seuls les enregistrements sélectionnés sont décompressés.
+    Sans --save, chaque résultat est affiché sur une ligne JSON.
+    """
+    cities = load_city_list(selected) if selected else None
+    count = 0
+
+    # --until 2025-11-02 (minuit) : jusqu'à la fin de la journée
+    if until is not None and until.time() == datetime.min.time():
+        until += timedelta(days=1) - timedelta(microseconds=1)
+
+    for key, fetched_at, formatted in replay_archive(
+        cities,
+        since.timestamp() if since else None,
+        until.timestamp() if until else None,
+        archive_file,
+    ):
+        count += 1
+        if save:
+            # Nom de fichier daté de la récupération : un fichier par enregistrement, même pour une même ville
+            fetched = datetime.fromtimestamp(fetched_at).strftime(REPLAY_TIMESTAMP_FORMAT)
+            save_to_file(formatted, f"{formatted['forecast_location_name']}_{formatted['country_code']}_{fetched}")
+        else:
+            click.echo(json.dumps(formatted, ensure_ascii=False))
+
+    logger.info(f"Sortie du programme (replay terminé, {count} enregistrement(s))")
+    click.echo(f"{count} enregistrement(s) rejoué(s).", err=True)
+
+# Sous-commande : retraitement en masse des JSON raw (dossier ou archive) sur plusieurs processus
+@cli.command()
+@click.argument('source', required=False, type=click.Path(exists=True))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help="Fichier JSON Lines produit (défaut : JSON Output/reprocess_<date>.jsonl) ; le même fichier reprend un traitement interrompu")
+@click.option('--workers', '-w', type=click.IntRange(min=1), help='Nombre de processus (défaut : nombre de cœurs)')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=REPROCESS_CHUNK_SIZE, show_default=True, help='Nombre de JSON raw par tâche')
+@click.option('--compress', is_flag=True, help='Compresser le fichier produit (gzip)')
+@click.option('--json-backend', type=click.Choice(JSON_BACKENDS), default="auto", show_default=True, help='Sérialiseur des lignes produites')
+def reprocess(source, output, workers, chunk_size, compress, json_backend):
+    """
+    Recalcule les résumés de tous les JSON raw d'un dossier ou de l'archive.
+
+    SOURCE : dossier de fichiers .json / .json.gz (parcouru récursivement) ou archive
+    (défaut : Archive/forecasts.wra). Le travail est réparti sur un pool de processus ;
+    après une interruption, relancer avec le même --output reprend le traitement.
+    """
+    if source is None and not os.path.exists(get_archive_path()):
+        click.echo(f"Erreur : archive introuvable ({get_archive_path()}).", err=True)
+        return
+
+    output = output or reprocess_output_path(compress)
+    if compress and not output.endswith(GZIP_EXTENSION):
+        output += GZIP_EXTENSION
+    click.echo(f"Retraitement vers le fichier : {output}", err=True)
+
+    path, count, errors = reprocess_raw_forecasts(source, output, workers, chunk_size, compress, json_backend)
+    if path is None:
+        click.echo(f"\nRetraitement interrompu après {count} résultat(s). Pour reprendre : --output \"{output}\"", err=True)
+        return
+
+    click.echo(f"{count} résultat(s) écrit(s) dans le fichier : {path}")
+    if errors:
+        click.echo(f"{errors} JSON raw illisible(s) ignoré(s) (voir les logs).", err=True)
+    logger.info("Sortie du programme (retraitement terminé)")
+
+# Sous-commandes : index local des villes (construction et recherche par préfixe)
+@cli.group('city-index')
+def city_index():
+    """
+    Index local des villes OpenWeatherMap (nom -> identifiant et coordonnées).
+
+    Une fois construit, les noms de villes sont résolus localement et les requêtes
+    partent par identifiant.
+    """
+
+@city_index.command('build')
+@click.argument('source', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help=f"Fichier d'index produit (défaut : {CITY_INDEX_FILE_NAME})")
+def city_index_build(source, output):
+    """
+    Construit l'index depuis city.list.json.gz (bulk.openweathermap.org/sample/).
+    """
+    path, count = build_city_index(source, output)
+    click.echo(f"Index des villes construit : {path} ({count} villes)")
+
+@city_index.command('search')
+@click.argument('prefix')
+@click.option('--country', '-co', help='Code pays (FR, US, etc.)')
+@click.option('--limit', '-n', type=click.IntRange(min=1), default=CITY_SEARCH_LIMIT, show_default=True, help='Nombre maximum de résultats')
+def city_index_search(prefix, country, limit):
+    """
+    Recherche les villes dont le nom commence par PREFIX (sans accents ni casse).
+    """
+    index = get_city_index()
+    if index is None:
+        click.echo(f"Erreur : index des villes introuvable ({get_city_index_path()}). Utilisez 'city-index build'.", err=True)
+        return
+
+    for record in index.search(prefix, country, limit):
+        click.echo(f"{record['id']:>10}  {record['name']}, {record['country']}  ({record['lat']}, {record['lon']})")
+
+# Sous-commande : surveillance d'une liste de villes (remplace un cron par ville)
+@cli.command()
+@click.argument('watchlist', type=click.Path(exists=True, dir_okay=False))
+@click.option('--interval', '-i', type=click.IntRange(min=1), default=WATCH_INTERVAL_SECONDS, show_default=True, help='Intervalle de rafraîchissement de chaque ville (secondes)')
+@click.option('--jitter', type=click.FloatRange(0, 0.5), default=WATCH_JITTER, show_default=True, help="Variation aléatoire de l'intervalle (0.1 = ±10 %)")
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=DEFAULT_BATCH_WORKERS, show_default=True, help='Rafraîchissements simultanés')
+@click.pass_obj
+def watch(obj, watchlist, interval, jitter, workers):
+    """
+    Rafraîchit en continu les villes de WATCHLIST (une ligne "ville,pays" par ville).
+
+    Les rafraîchissements sont étalés sur l'intervalle, les prévisions en cache les plus
+    anciennes d'abord. Modifier WATCHLIST ou local.conf (ou envoyer SIGHUP) recharge la
+    configuration sans redémarrer.
+    """
+    if obj["api_key"] and read_api_key_status(obj["api_key"]) is False:
+        click.echo("Erreur : La clé API n'est pas valide.", err=True)
+        logger.info("Sortie du programme (clé API invalide en mode surveillance)")
+        return
+
+    configure_http_session(pool_maxsize=obj["pool_size"] or max(workers, HTTP_POOL_MAXSIZE))
+    click.echo(f"Surveillance de {watchlist} toutes les {interval}s (Ctrl+C pour arrêter)")
+    WatchScheduler(watchlist, obj["api_key"], interval, jitter, workers, obj["incremental"], obj["aggregation_overrides"]).run()
+    logger.info("Sortie du programme (mode surveillance terminé)")
+
+# Sous-commande : service HTTP longue durée (GET /report?city=&country=)
+@cli.command()
+@click.option('--host', default=DEFAULT_SERVER_HOST, show_default=True, help="Adresse d'écoute")
+@click.option('--port', '-p', type=click.IntRange(1, 65535), default=DEFAULT_SERVER_PORT, show_default=True, help="Port d'écoute")
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=DEFAULT_SERVER_WORKERS, show_default=True, help='Requêtes API simultanées vers OpenWeatherMap')
+@click.pass_obj
+def serve(obj, host, port, workers):
+    """
+    Lance un serveur HTTP exposant le rapport météo formaté.
+
+    GET /report?city=Paris&country=FR (ou ?id=2988507, ou ?lat=48.85&lon=2.35 ; ajouter
+    &refresh=1 pour ignorer le cache), GET /health, GET /metrics. La clé API, le pool HTTP et le cache restent chargés entre les requêtes.
+    """
+    api_key = obj["api_key"] or load_api_key()
+    if not api_key:
+        click.echo("Erreur : Clé API introuvable dans 'local.conf'.", err=True)
+        click.echo("Utilisez --api-key pour fournir une clé API.", err=True)
+        logger.info("Sortie du programme (clé API introuvable en mode serveur)")
+        return
+
+    if read_api_key_status(api_key) is False:
+        click.echo("Erreur : La clé API n'est pas valide.", err=True)
+        logger.info("Sortie du programme (clé API invalide en mode serveur)")
+        return
+
+    configure_http_session(pool_maxsize=obj["pool_size"] or max(workers, HTTP_POOL_MAXSIZE))
+    click.echo(f"Serveur de rapports en écoute sur http://{host}:{port} (Ctrl+C pour arrêter)")
+    ReportServer(api_key, host, port, workers).run()
+    logger.info("Sortie du programme (mode serveur terminé)")
+
 if __name__ == "__main__":
     cli()
 